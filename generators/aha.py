@@ -6,6 +6,15 @@ from generators.hazard_map import hazards_for_activity
 from utils import get_chroma_client, get_default_chroma_dir, get_or_create_collection, query_collection, keyword_search_collection
 import re
 
+# Compiled once; these helpers run per retrieved block/line for every AHA
+_OCR_NOTE_RE = re.compile(r"\[(?:[^\]]*ocr[^\]]*|[^\]]*merge[^\]]*)\]", re.IGNORECASE)
+_WS_RE = re.compile(r"\s+")
+_SENTENCE_END_RE = re.compile(r"(?<=[.!?])\s+")
+_WORD_RE = re.compile(r"[a-z0-9]+")
+_NON_WORD_RE = re.compile(r"[^A-Za-z0-9]+")
+# Any of the control keywords (one alternation instead of a search per keyword)
+_CTRL_RE = re.compile(r"\bshall\b|\bmust\b|control|ensure|required|prohibit|procedure")
+
 
 def _build_retrieval_query(activity: str, hazard: str) -> str:
     # Encourage section tokens to surface with keywords
@@ -51,7 +60,7 @@ def _clean_text_block(text: str) -> str:
             continue
         # Remove bracketed OCR notes like [OCR Merge]
         if "[" in s and "]" in s:
-            s = re.sub(r"\[(?:[^\]]*ocr[^\]]*|[^\]]*merge[^\]]*)\]", "", s, flags=re.IGNORECASE).strip()
+            s = _OCR_NOTE_RE.sub("", s).strip()
             if not s:
                 continue
         # Drop mostly-nonalpha lines and very short debris
@@ -60,7 +69,7 @@ def _clean_text_block(text: str) -> str:
         if total < 20 or (alpha / total) < 0.6:
             continue
         # Collapse whitespace and dedupe (global within this block)
-        s = re.sub(r"\s+", " ", s)
+        s = _WS_RE.sub(" ", s)
         if s in seen:
             continue
         seen.add(s)
@@ -71,17 +80,17 @@ def _clean_text_block(text: str) -> str:
 def _normalize_quote_anchor(s: str, max_chars: int = 240) -> str:
     if not s:
         return ""
-    t = re.sub(r"\s+", " ", s).strip()
+    t = _WS_RE.sub(" ", s).strip()
     # Keep at most first 3 sentences
-    parts = re.split(r"(?<=[.!?])\s+", t)
+    parts = _SENTENCE_END_RE.split(t)
     t = " ".join(parts[:3])
     return t[:max_chars].rstrip()
 
 
 def _is_relevant_quote(activity: str, hazard: str, quote: str) -> bool:
-    a = set(re.findall(r"[a-z0-9]+", (activity or "").lower()))
-    h = set(re.findall(r"[a-z0-9]+", (hazard or "").lower()))
-    q = set(re.findall(r"[a-z0-9]+", (quote or "").lower()))
+    a = set(_WORD_RE.findall((activity or "").lower()))
+    h = set(_WORD_RE.findall((hazard or "").lower()))
+    q = set(_WORD_RE.findall((quote or "").lower()))
     overlap = (a | h) & q
     return len(overlap) >= 1
 
@@ -100,7 +109,7 @@ def generate_basic_aha(activity: str, collection_name: str) -> AhaDoc:
         res_vec = query_collection(col, q, n_results=10)
         # Expand substrings to broaden matches (tokenize + simple stemming)
         def _tokens(s: str) -> list[str]:
-            toks = [t for t in re.split(r"[^A-Za-z0-9]+", (s or "").lower()) if t]
+            toks = [t for t in _NON_WORD_RE.split((s or "").lower()) if t]
             extra: list[str] = []
             for t in toks:
                 if t.endswith("ing") and len(t) > 4:
@@ -151,7 +160,6 @@ def _extract_lists_from_docs(docs: List[str]) -> Tuple[List[str], List[str], Lis
     ppe: List[str] = []
     permits: List[str] = []
 
-    ctrl_keys = [r"\bshall\b", r"\bmust\b", r"control", r"ensure", r"required", r"prohibit", r"procedure"]
     ppe_keys = ["ppe", "glove", "eye", "goggle", "face shield", "hearing", "respirator", "life jacket", "flotation", "harness", "lanyard", "hi-vis", "hard hat", "steel-toe"]
     permit_keys = [
         "permit",
@@ -174,7 +182,7 @@ def _extract_lists_from_docs(docs: List[str]) -> Tuple[List[str], List[str], Lis
         v = (val or "").strip()
         if not v:
             return
-        v = re.sub(r"\s+", " ", v)[:max_len]
+        v = _WS_RE.sub(" ", v)[:max_len]
         if v not in lst:
             lst.append(v)
 
@@ -185,7 +193,7 @@ def _extract_lists_from_docs(docs: List[str]) -> Tuple[List[str], List[str], Lis
             if not l:
                 continue
             l_low = l.lower()
-            if any(re.search(k, l_low) for k in ctrl_keys):
+            if _CTRL_RE.search(l_low):
                 add_unique(controls, l)
             if any(k in l_low for k in ppe_keys):
                 add_unique(ppe, l)
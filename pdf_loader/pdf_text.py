@@ -65,6 +65,8 @@ def extract_text(
 ) -> Dict[int, str]:
     """Return mapping of 1-based page numbers to text, optionally including table markdown.
 
+    Keys are inserted in ascending page order, so iterating the mapping yields pages in order.
+
     Parameters
     ----------
     pdf_path: Path
@@ -9,9 +9,12 @@ extended with production-ready logic once document parsing, metadata
 management, context pack creation, and export features are implemented.
 """
 
+import functools
 import json
+import os
 import re
 import zipfile
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass, field
 from pathlib import Path
 from typing import Any, Dict, Iterable, List, Optional, Tuple
@@ -38,7 +41,11 @@ from ..csp_pipeline import (
 from context.context_builder import SECTION_DEFINITIONS, build_context_packs
 from context.document_ingestion import DocumentIngestionEngine
 from context.dfow_mapping import map_dfow_to_plans
-from context.placeholder_manager import format_placeholder, contains_placeholder
+from context.placeholder_manager import (
+    contains_placeholder,
+    find_unresolved_tokens,
+    format_placeholder,
+)
 from context.project_metadata_extractor import BANNED_SUBSTRINGS as METADATA_BANNED
 from export.docx_writer import write_csp_docx
 from export.pdf_writer import write_csp_pdf
@@ -46,26 +53,32 @@ from generators.csp import assemble_csp_doc, build_csp_sections
 from generators.section_orchestrator import SectionRunResult
 
 
+# Section paragraphs are plain strings and boilerplate repeats across sections,
+# so the placeholder scans are memoised per text.
+_contains_placeholder = functools.lru_cache(maxsize=8192)(contains_placeholder)
+
+
+@functools.lru_cache(maxsize=8192)
+def _find_unresolved(text: str) -> Tuple[Tuple[str, int], ...]:
+    return tuple(find_unresolved_tokens(text))
+
+
 def _ensure_output_dir(base_dir: Path) -> None:
     base_dir.mkdir(parents=True, exist_ok=True)
 
 
-def _generate_appendices(base_dir: Path, processing: ProcessingState) -> List[str]:
+def _generate_appendices(processing: ProcessingState) -> List[Tuple[str, bytes]]:
     """Generate appendix stub files A1-A6.
     
-    Returns list of created appendix file paths.
+    Returns ``(file name, UTF-8 content)`` pairs that are written straight into
+    the CSP package archive.
     """
-    appendices_dir = base_dir / "appendices"
-    appendices_dir.mkdir(parents=True, exist_ok=True)
-    created: List[str] = []
+    created: List[Tuple[str, str]] = []
     
     # A1: Project Map (placeholder PDF/MD)
-    a1_path = appendices_dir / "A1_Project_Map.md"
-    a1_path.write_text("# Appendix 1: Project Map\n\n*Insert site map here*\n", encoding="utf-8")
-    created.append(str(a1_path))
+    created.append(("A1_Project_Map.md", "# Appendix 1: Project Map\n\n*Insert site map here*\n"))
     
     # A2: Subcontractor Roster (table scaffold)
-    a2_path = appendices_dir / "A2_Subcontractor_Roster.md"
     a2_content = """# Appendix 2: Subcontractor Roster
 
 | Company Name | Contact Person | Phone | Email | Insurance Expiry | Certificates |
@@ -73,11 +86,9 @@ def _generate_appendices(base_dir: Path, processing: ProcessingState) -> List[st
 | *Insert subcontractors* | | | | | |
 
 """
-    a2_path.write_text(a2_content, encoding="utf-8")
-    created.append(str(a2_path))
+    created.append(("A2_Subcontractor_Roster.md", a2_content))
     
     # A3: Personnel Qualifications (matrix scaffold)
-    a3_path = appendices_dir / "A3_Personnel_Qualifications.md"
     a3_content = """# Appendix 3: Personnel Qualifications
 
 | Name | Role | Qualification | Issue Date | Expiry Date | Certificate # |
@@ -85,22 +96,18 @@ def _generate_appendices(base_dir: Path, processing: ProcessingState) -> List[st
 | *Insert personnel* | | | | | |
 
 """
-    a3_path.write_text(a3_content, encoding="utf-8")
-    created.append(str(a3_path))
+    created.append(("A3_Personnel_Qualifications.md", a3_content))
     
     # A4: AHA Index (table with DFOW, residual risk, approval dates)
-    a4_path = appendices_dir / "A4_AHA_Index.md"
     dfow_list = processing.context_packs.get("section_02", {}).get("dfow", [])
     a4_content = "# Appendix 4: Activity Hazard Analyses Index\n\n"
     a4_content += "| DFOW | AHA Title | Residual Risk | Approval Date | Approved By | Status |\n"
     a4_content += "| --- | --- | --- | --- | --- | --- |\n"
     for dfow_item in dfow_list[:10]:  # Limit to first 10 for scaffold
         a4_content += f"| {dfow_item} | *AHA pending* | | | | Pending |\n"
-    a4_path.write_text(a4_content, encoding="utf-8")
-    created.append(str(a4_path))
+    created.append(("A4_AHA_Index.md", a4_content))
     
     # A5: Site-Specific Plans Register
-    a5_path = appendices_dir / "A5_Site_Specific_Plans_Register.md"
     a5_content = "# Appendix 5: Site-Specific Plans Register\n\n"
     a5_content += "| Plan Name | Status | Owner | Due Date | Approval Date | File Reference |\n"
     a5_content += "| --- | --- | --- | --- | --- | --- |\n"
@@ -108,11 +115,9 @@ def _generate_appendices(base_dir: Path, processing: ProcessingState) -> List[st
         status = details.get("status", "Not Applicable")
         justification = details.get("justification", "")
         a5_content += f"| {plan_name} | {status} | *Assign* | | | {justification} |\n"
-    a5_path.write_text(a5_content, encoding="utf-8")
-    created.append(str(a5_path))
+    created.append(("A5_Site_Specific_Plans_Register.md", a5_content))
     
     # A6: Revision Log
-    a6_path = appendices_dir / "A6_Revision_Log.md"
     a6_content = """# Appendix 6: Revision Log
 
 | Revision | Date | Change Description | Author | Approved By |
@@ -120,10 +125,9 @@ def _generate_appendices(base_dir: Path, processing: ProcessingState) -> List[st
 | 0 | | Initial issue | | |
 
 """
-    a6_path.write_text(a6_content, encoding="utf-8")
-    created.append(str(a6_path))
+    created.append(("A6_Revision_Log.md", a6_content))
     
-    return created
+    return [(name, content.encode("utf-8")) for name, content in created]
 
 
 class DefaultDocumentIngestionService(DocumentIngestionService):
@@ -653,29 +657,35 @@ class DefaultOutputAssembler(OutputAssembler):
         manifest_path = base_dir / "manifest.json"
 
         # Generate appendix stubs before export
-        appendices_created = _generate_appendices(base_dir, processing)
-        
-        write_csp_docx(csp_doc, str(docx_path))
-        write_csp_pdf(csp_doc, str(pdf_path))
+        appendices_created = _generate_appendices(processing)
+
+        # DOCX and PDF exports are independent I/O-bound writes; run them in the
+        # background while the manifest is assembled on this thread.
+        export_pool = ThreadPoolExecutor(max_workers=2)
+        fut_docx = export_pool.submit(write_csp_docx, csp_doc, str(docx_path))
+        fut_pdf = export_pool.submit(write_csp_pdf, csp_doc, str(pdf_path))
+        export_pool.shutdown(wait=False)
 
         name_to_identifier = {definition.title: definition.identifier for definition in SECTION_DEFINITIONS}
         
-        # Count placeholders and unresolved tokens
-        from context.placeholder_manager import find_unresolved_tokens
+        # Count placeholders and unresolved tokens while building the section payload
         unresolved_tokens: Dict[str, List[str]] = {}
         placeholders_remaining_count = 0
-        for section in csp_doc.sections:
-            combined_text = " ".join(section.paragraphs)
-            tokens = find_unresolved_tokens(combined_text)
-            if tokens:
-                unresolved_tokens[section.name] = sorted(set([t[0] for t in tokens]))
-                placeholders_remaining_count += len(tokens)
         sections_payload = []
         unique_documents: set[str] = set()
+        doc_name_cache: Dict[str, str] = {}
         for section in csp_doc.sections:
+            tokens = _find_unresolved(" ".join(section.paragraphs))
+            if tokens:
+                unresolved_tokens[section.name] = sorted({t[0] for t in tokens})
+                placeholders_remaining_count += len(tokens)
             identifier = name_to_identifier.get(section.name)
             context = processing.context_packs.get(identifier, {}) if identifier else {}
-            context_docs = [Path(doc).name for doc in (context.get("documents", []) or []) if doc]
+            context_docs = [
+                doc_name_cache.get(doc) or doc_name_cache.setdefault(doc, os.path.basename(doc))
+                for doc in (context.get("documents", []) or [])
+                if doc
+            ]
             unique_documents.update(context_docs)
             sections_payload.append({
                 "name": section.name,
@@ -684,7 +694,7 @@ class DefaultOutputAssembler(OutputAssembler):
                 "documents": context_docs,
                 "has_references": any((par or "").strip().startswith("References:") for par in section.paragraphs),
                 "placeholder_flags": bool(context.get("placeholders")),
-                "placeholder_count": sum(1 for par in section.paragraphs if contains_placeholder(par)),
+                "placeholder_count": sum(1 for par in section.paragraphs if _contains_placeholder(par)),
                 "citation_count": len(section.citations or []),
                 "document_count": len(context_docs),
                 "llm_guidance_only": len(context_docs) == 0,
@@ -716,7 +726,7 @@ class DefaultOutputAssembler(OutputAssembler):
             "site_plans_required": [{"name": name, "justification": processing.sub_plan_matrix[name].get("justification", "")} for name in required_plans],
             "site_plans_pending": [{"name": name, "justification": processing.sub_plan_matrix[name].get("justification", "")} for name in pending_plans],
             "site_plans_na": [{"name": name, "justification": processing.sub_plan_matrix[name].get("justification", "")} for name in na_plans],
-            "appendices_created": [Path(p).name for p in appendices_created],
+            "appendices_created": [name for name, _ in appendices_created],
         }
 
         manifest = {
@@ -749,21 +759,47 @@ class DefaultOutputAssembler(OutputAssembler):
             },
         }
 
+        wrote_docx = wrote_pdf = wrote_manifest = True
+        try:
+            fut_docx.result()
+        except Exception:
+            wrote_docx = False
+            validation.warnings.append("Failed to write Compiled_CSP_Final.docx.")
+        try:
+            fut_pdf.result()
+        except Exception:
+            wrote_pdf = False
+            validation.warnings.append("Failed to write Compiled_CSP_Final.pdf.")
+
         package_path: Path | None = base_dir / "Compiled_CSP_Final_package.zip"
         try:
-            manifest_path.write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+            # Streamed: large manifests are never held as one encoded string. The
+            # dump goes to a temp file that replaces manifest.json only once
+            # complete, so a failure never leaves a truncated manifest behind.
+            tmp_manifest = manifest_path.with_name(manifest_path.name + ".tmp")
+            try:
+                with tmp_manifest.open("w", encoding="utf-8") as handle:
+                    json.dump(manifest, handle, indent=2)
+                os.replace(tmp_manifest, manifest_path)
+            except BaseException:
+                tmp_manifest.unlink(missing_ok=True)
+                raise
         except Exception:
+            wrote_manifest = False
             validation.warnings.append("Failed to write manifest.json; check file permissions.")
         try:
             with zipfile.ZipFile(package_path, "w", compression=zipfile.ZIP_DEFLATED) as bundle:
-                for artifact in (docx_path, pdf_path, manifest_path):
-                    if Path(artifact).exists():
-                        bundle.write(Path(artifact), arcname=Path(artifact).name)
-                # Add appendices to bundle
-                appendices_dir = base_dir / "appendices"
-                if appendices_dir.exists():
-                    for appendix_file in appendices_dir.glob("*.md"):
-                        bundle.write(appendix_file, arcname=f"appendices/{appendix_file.name}")
+                artifacts = [
+                    (docx_path, wrote_docx),
+                    (pdf_path, wrote_pdf),
+                    (manifest_path, wrote_manifest),
+                ]
+                for artifact, written in artifacts:
+                    if written:
+                        bundle.write(artifact, arcname=artifact.name)
+                # Add appendices to bundle straight from memory
+                for appendix_name, appendix_data in appendices_created:
+                    bundle.writestr(f"appendices/{appendix_name}", appendix_data)
                 snapshot_path = base_dir / "context" / "snapshot.json"
                 if snapshot_path.exists():
                     bundle.write(snapshot_path, arcname=f"context/{snapshot_path.name}")
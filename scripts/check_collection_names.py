@@ -10,33 +10,32 @@ sys.path.insert(0, str(project_root))
 
 from utils import get_chroma_client, get_default_chroma_dir, get_default_collection_name, resolve_collection_name
 
-def find_collection_names_in_code():
-    """Find all hardcoded collection names in the codebase."""
-    patterns = {
+_COLLECTION_PATTERNS = {
+    name: re.compile(pattern)
+    for name, pattern in {
         "em385_2024": r"em385_2024",
         "csp_documents": r"csp_documents",
         "msf_index": r"msf_index",
         "docs": r'"docs"|\'docs\'',
-    }
-    
-    results = {}
+    }.items()
+}
+
+def find_collection_names_in_code():
+    """Find all hardcoded collection names in the codebase."""
+    results = {name: [] for name in _COLLECTION_PATTERNS}
     codebase_root = project_root
     
-    for name, pattern in patterns.items():
-        matches = []
-        for py_file in codebase_root.rglob("*.py"):
-            try:
-                content = py_file.read_text(encoding='utf-8')
-                for line_num, line in enumerate(content.splitlines(), 1):
-                    if re.search(pattern, line):
-                        matches.append((str(py_file.relative_to(codebase_root)), line_num, line.strip()))
-            except Exception:
-                pass
-        
-        if matches:
-            results[name] = matches
+    for py_file in codebase_root.rglob("*.py"):
+        try:
+            with py_file.open("r", encoding="utf-8", errors="ignore") as fh:
+                for line_num, line in enumerate(fh, 1):
+                    for name, rx in _COLLECTION_PATTERNS.items():
+                        if rx.search(line):
+                            results[name].append((str(py_file.relative_to(codebase_root)), line_num, line.strip()))
+        except Exception:
+            pass
     
-    return results
+    return {name: matches for name, matches in results.items() if matches}
 
 def check_chromadb_collections():
     """Check what collections actually exist in ChromaDB."""
@@ -118,8 +117,8 @@ def main():
     print("\n4. Verification:")
     print("-" * 80)
     if db_status["exists"]:
-        existing = set(db_status["collections"].keys())
-        expected = set(expected_collections.keys())
+        existing = db_status["collections"].keys()
+        expected = expected_collections.keys()
         
         missing = expected - existing
         extra = existing - expected
@@ -149,7 +148,7 @@ def main():
         print("   - MSF:   python scripts/msf_ingest.py <file> --collection msf_index")
         print("   - CSP:   Will auto-index during pipeline run")
     else:
-        missing = set(expected_collections.keys()) - set(db_status.get("collections", {}).keys())
+        missing = expected_collections.keys() - db_status.get("collections", {}).keys()
         if missing:
             print(f"1. Missing collections: {', '.join(missing)}")
             print("   Reingest documents into these collections")
@@ -51,6 +51,7 @@ def run_smoke_query() -> int:
     cfg = load_vertex_config(raise_on_missing=True)
 
     deployed_ids: list[str] = []
+    endpoint = None
 
     if _HAS_CLIENT:
         try:
@@ -77,7 +78,9 @@ def run_smoke_query() -> int:
         from config import embedding_dimensions_from_env
         dims = embedding_dimensions_from_env()
         vec = [0.0] * dims
-        endpoint = aiplatform.MatchingEngineIndexEndpoint(index_endpoint_name=cfg.endpoint_id)  # type: ignore
+        # Reuse the handle from the deployment lookup; only rebuild it if that step failed.
+        if endpoint is None:
+            endpoint = aiplatform.MatchingEngineIndexEndpoint(index_endpoint_name=cfg.endpoint_id)  # type: ignore
         did = cfg.deployed_index_id or (deployed_ids[0] if deployed_ids else None)
         if not did:
             print("[debug] No deployed index id resolved; skipping neighbor check")
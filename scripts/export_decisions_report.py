@@ -36,12 +36,27 @@ def _init_db():
     return firestore.client()
 
 
+def _stream(db, coll_name: str, prefix: str | None):
+    """Stream a collection, narrowing to ids starting with ``prefix`` server-side."""
+    coll = db.collection(coll_name)
+    if not prefix:
+        return coll.stream()
+    from google.cloud.firestore_v1.base_query import FieldFilter
+    from google.cloud.firestore_v1.field_path import FieldPath
+    doc_id = FieldPath.document_id()
+    return (
+        coll.where(filter=FieldFilter(doc_id, ">=", coll.document(prefix)))
+        .where(filter=FieldFilter(doc_id, "<", coll.document(prefix + "\uf8ff")))
+        .stream()
+    )
+
+
 def _collect(db, prefix: str | None) -> Tuple[List[Dict[str, Any]], List[str]]:
     """Return list of decisions and list of missing codes (codes without decisions)."""
     # decisions
     decisions: List[Dict[str, Any]] = []
     dec_ids = set()
-    for doc in db.collection("decisions").stream():
+    for doc in _stream(db, "decisions", prefix):
         cid = doc.id
         if prefix and not cid.startswith(prefix):
             continue
@@ -53,7 +68,7 @@ def _collect(db, prefix: str | None) -> Tuple[List[Dict[str, Any]], List[str]]:
     # missing vs codes collection
     missing: List[str] = []
     try:
-        for doc in db.collection("codes").stream():
+        for doc in _stream(db, "codes", prefix):
             cid = doc.id
             if prefix and not cid.startswith(prefix):
                 continue
@@ -1,8 +1,15 @@
 from __future__ import annotations
 
 import argparse
+import functools
 import hashlib
+import json
+import multiprocessing
 import os
+import queue
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 from typing import Any, Dict, List, Optional, Tuple
 import re
@@ -15,15 +22,91 @@ from utils import (
 )
 
 
+@functools.lru_cache(maxsize=8)
+def _client_for(persist_dir: str):
+    return get_chroma_client(persist_dir)
+
+
+@functools.lru_cache(maxsize=32)
+def _col_for(persist_dir: str, name: str):
+    """Open (or create) a collection once per process and reuse it across ingests."""
+    return get_or_create_collection(_client_for(persist_dir), name)
+
+
 def _sha256(s: str) -> str:
     return hashlib.sha256(s.encode("utf-8")).hexdigest()
 
 
+_W_NS = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+_W = f"{{{_W_NS}}}"
+# Run-level text equivalents, mirroring python-docx's ``Paragraph.text``.
+_W_RUN_TEXT = {
+    f"{_W}tab": "\t",
+    f"{_W}ptab": "\t",
+    f"{_W}cr": "\n",
+    f"{_W}noBreakHyphen": "-",
+}
+
+
+def _read_docx_xml(path: Path) -> Optional[Tuple[List[str], List[Dict[str, Any]]]]:
+    """Extract paragraphs and table cells straight from ``word/document.xml``.
+
+    Walking the XML with compiled lxml XPath avoids python-docx creating a wrapper
+    object per paragraph, run and cell. Returns ``None`` when lxml or the main
+    document part is unavailable so the caller can fall back to python-docx.
+    """
+    try:
+        import zipfile
+        from lxml import etree  # type: ignore
+    except Exception:
+        return None
+    try:
+        with zipfile.ZipFile(path) as zf:
+            xml = zf.read("word/document.xml")
+    except KeyError:
+        return None
+    root = etree.fromstring(xml)
+    ns = {"w": _W_NS}
+    body = root.find(f"{_W}body")
+    if body is None:
+        return [], []
+    run_items = etree.XPath("w:r/* | w:hyperlink/w:r/*", namespaces=ns)
+    br_tag = f"{_W}br"
+    t_tag = f"{_W}t"
+    br_type = f"{_W}type"
+
+    def _para_text(p: Any) -> str:
+        parts: List[str] = []
+        for e in run_items(p):
+            tag = e.tag
+            if tag == t_tag:
+                parts.append(e.text or "")
+            elif tag == br_tag:
+                if e.get(br_type, "textWrapping") == "textWrapping":
+                    parts.append("\n")
+            else:
+                mapped = _W_RUN_TEXT.get(tag)
+                if mapped:
+                    parts.append(mapped)
+        return "".join(parts)
+
+    paras = [_para_text(p).strip() for p in body.iterchildren(f"{_W}p")]
+    tables: List[Dict[str, Any]] = []
+    for tc in etree.XPath("w:tbl/w:tr/w:tc", namespaces=ns)(body):
+        t = "\n".join(_para_text(p) for p in tc.iterchildren(f"{_W}p")).strip()
+        if t:
+            tables.append({"text": t})
+    return paras, tables
+
+
 def _read_docx(path: Path) -> Tuple[List[str], List[Dict[str, Any]]]:
     """Read DOCX and return list of paragraph-like strings and a list of table cell strings.
 
     Falls back gracefully if python-docx is missing.
     """
+    fast = _read_docx_xml(path)
+    if fast is not None:
+        return fast
     try:
         from docx import Document  # type: ignore
     except Exception as e:
@@ -42,11 +125,18 @@ def _read_docx(path: Path) -> Tuple[List[str], List[Dict[str, Any]]]:
 
 _SEC_CODE_RE = re.compile(r"^(?P<div>\d{2})\s+(?P<s1>\d{2})\s+(?P<s2>\d{2})(?:\.(?P<s3>\d{2}))?(?:\s+[-–—]?\s*(?P<title>.*))?$")
 
+# Same pattern, anchored on ``\x1e`` record separators so one ``finditer`` sweeps
+# every paragraph; whitespace/title classes exclude the separator so a match
+# never spans two paragraphs. ``\x1e`` is invalid XML, so DOCX text should never
+# contain it; ``_detect_section_headers`` still falls back per paragraph if it does.
+_SEP = "\x1e"
+_SEC_CODE_SWEEP_RE = re.compile(
+    r"(?:^|(?<=\x1e))(?P<div>\d{2})[^\S\x1e]+(?P<s1>\d{2})[^\S\x1e]+(?P<s2>\d{2})(?:\.(?P<s3>\d{2}))?"
+    r"(?:[^\S\x1e]+[-–—]?[^\S\x1e]*(?P<title>[^\x1e\n]*))?(?=\x1e|\Z)"
+)
 
-def _detect_section_header(s: str) -> Optional[Dict[str, str]]:
-    m = _SEC_CODE_RE.match((s or "").strip())
-    if not m:
-        return None
+
+def _header_from_match(m: "re.Match[str]") -> Dict[str, str]:
     div = m.group("div")
     s1 = m.group("s1")
     s2 = m.group("s2")
@@ -56,22 +146,56 @@ def _detect_section_header(s: str) -> Optional[Dict[str, str]]:
     return {"division": div, "section_code": section_code, "section_title": title}
 
 
+def _detect_section_header(s: str) -> Optional[Dict[str, str]]:
+    m = _SEC_CODE_RE.match((s or "").strip())
+    return _header_from_match(m) if m else None
+
+
+def _detect_section_headers(paras: List[str]) -> Dict[int, Dict[str, str]]:
+    """Map paragraph index -> header for every (stripped) paragraph that is a section header."""
+    if any(_SEP in para for para in paras):
+        # The separator would split a paragraph and break the offset lookup; check
+        # each paragraph on its own instead.
+        headers: Dict[int, Dict[str, str]] = {}
+        for idx, para in enumerate(paras):
+            hdr = _detect_section_header(para)
+            if hdr:
+                headers[idx] = hdr
+        return headers
+    starts: Dict[int, int] = {}
+    pos = 0
+    for idx, para in enumerate(paras):
+        starts[pos] = idx
+        pos += len(para) + 1
+    joined = _SEP.join(paras)
+    return {starts[m.start()]: _header_from_match(m) for m in _SEC_CODE_SWEEP_RE.finditer(joined)}
+
+
 def _chunk_text_with_overlap(lines: List[str], chunk_chars: int, overlap_chars: int) -> List[str]:
     chunks: List[str] = []
-    buf = ""
+    # Accumulate parts and join once per chunk; repeated ``str +=`` re-copies the buffer.
+    buf_parts: List[str] = []
+    buf_len = 0
     for line in lines:
-        if buf:
-            buf += "\n"
-        buf += line
-        if len(buf) >= chunk_chars:
-            chunks.append(buf)
+        if buf_len:
+            buf_parts.append("\n")
+            buf_len += 1
+        buf_parts.append(line)
+        buf_len += len(line)
+        if buf_len >= chunk_chars:
+            chunk = "".join(buf_parts)
+            chunks.append(chunk)
             # build overlap
-            if overlap_chars > 0 and len(buf) > overlap_chars:
-                buf = buf[-overlap_chars:]
+            if overlap_chars > 0 and buf_len > overlap_chars:
+                overlap = chunk[-overlap_chars:]
+                buf_parts = [overlap]
+                buf_len = len(overlap)
             else:
-                buf = ""
-    if buf.strip():
-        chunks.append(buf)
+                buf_parts = []
+                buf_len = 0
+    tail = "".join(buf_parts)
+    if tail.strip():
+        chunks.append(tail)
     return chunks
 
 
@@ -106,10 +230,11 @@ def ingest_msf_docx(
             })
             current["lines"] = []
 
-    for p in paras:
+    headers = _detect_section_headers(paras)
+    for i, p in enumerate(paras):
         if not p:
             continue
-        hdr = _detect_section_header(p)
+        hdr = headers.get(i)
         if hdr:
             # flush previous section
             _flush_current()
@@ -142,12 +267,34 @@ def ingest_msf_docx(
             "_hash": doc_hash,
         }]
 
-    client = get_chroma_client(get_default_chroma_dir())
-    col = get_or_create_collection(client, collection_name)
-
-    ids: List[str] = []
-    docs: List[str] = []
-    metas: List[Dict[str, Any]] = []
+    col = _col_for(get_default_chroma_dir(), collection_name)
+
+    # Chunking stays on this thread while a single indexer thread drains
+    # batches into Chroma, so embedding/upsert overlaps with chunk assembly.
+    batch_size = 100
+    pending: "queue.Queue[Optional[Tuple[List[str], List[str], List[Dict[str, Any]]]]]" = queue.Queue(maxsize=4)
+    index_errors: List[BaseException] = []
+
+    def _indexer() -> None:
+        while True:
+            batch = pending.get()
+            if batch is None:
+                return
+            if index_errors:
+                continue
+            try:
+                add_documents_to_collection(col, *batch, batch_size=batch_size)
+            except BaseException as exc:
+                index_errors.append(exc)
+
+    indexer = threading.Thread(target=_indexer, name="msf-indexer", daemon=True)
+    indexer.start()
+
+    # Batches have a fixed size, so each one is preallocated and filled by index.
+    ids: List[Any] = [None] * batch_size
+    docs: List[Any] = [None] * batch_size
+    metas: List[Any] = [None] * batch_size
+    fill = 0
     base_doc_id = doc_id or path.stem
     global_idx = 0
     for sec in sections:
@@ -162,9 +309,9 @@ def ingest_msf_docx(
         for ch in sec_chunks:
             cid = f"msf_{base_doc_id}_{doc_hash[:8]}_{global_idx:05d}"
             global_idx += 1
-            ids.append(cid)
-            docs.append(ch)
-            metas.append({
+            ids[fill] = cid
+            docs[fill] = ch
+            metas[fill] = {
                 "doc_id": base_doc_id,
                 "division": sec.get("division", ""),
                 "section_code": sec.get("section_code", ""),
@@ -174,11 +321,77 @@ def ingest_msf_docx(
                 "headings": "",
                 "source_type": "MSF",
                 "hash": doc_hash,
-            })
+            }
+            fill += 1
+            if fill == batch_size:
+                pending.put((ids, docs, metas))
+                ids, docs, metas = [None] * batch_size, [None] * batch_size, [None] * batch_size
+                fill = 0
+
+    if fill:
+        pending.put((ids[:fill], docs[:fill], metas[:fill]))
+    pending.put(None)
+    indexer.join()
+    if index_errors:
+        raise index_errors[0]
+    return global_idx
+
+
+def _process_pdf_range(job: Tuple[str, str, str, str, Optional[int]]) -> List[Dict[str, Any]]:
+    """Worker: run the pdf_loader over one page range (e.g. ``"1-40"``)."""
+    from pdf_loader import process_pdf as _process_pdf
 
-    if ids:
-        add_documents_to_collection(col, ids, docs, metas, batch_size=100)
-    return len(ids)
+    pdf_path, part_json, img_dir, page_range, render_dpi = job
+    return _process_pdf(
+        Path(pdf_path),
+        Path(part_json),
+        Path(img_dir),
+        chunk_size=400,
+        page_range=page_range,
+        render_pages_dpi=render_dpi,
+    )
+
+
+def _process_pdf_parallel(
+    p: Path,
+    out_json: Path,
+    img_dir: Path,
+    render_dpi: Optional[int],
+    max_workers: Optional[int],
+) -> List[Dict[str, Any]]:
+    """Render/OCR page ranges in worker processes and stitch the chunks in page order."""
+    import fitz  # PyMuPDF, already required by pdf_loader
+
+    with fitz.open(p) as doc:
+        total_pages = len(doc)
+    workers = max(1, min(max_workers or min(8, os.cpu_count() or 1), total_pages))
+    if workers == 1:
+        return _process_pdf_range((str(p), str(out_json), str(img_dir), "", render_dpi))
+
+    step = -(-total_pages // workers)
+    with tempfile.TemporaryDirectory() as tmp:
+        jobs = [
+            (
+                str(p),
+                str(Path(tmp) / f"part_{start:05d}.json"),
+                str(img_dir),
+                f"{start}-{min(start + step - 1, total_pages)}",
+                render_dpi,
+            )
+            for start in range(1, total_pages + 1, step)
+        ]
+        with ProcessPoolExecutor(
+            max_workers=len(jobs),
+            mp_context=multiprocessing.get_context("spawn"),
+        ) as executor:
+            parts = list(executor.map(_process_pdf_range, jobs))
+
+    chunks = [ch for part in parts for ch in part]
+    for idx, ch in enumerate(chunks):
+        ch["chunk_id"] = idx
+    with out_json.open("w", encoding="utf-8") as f:
+        json.dump(chunks, f, ensure_ascii=False, indent=2)
+    return chunks
 
 
 def ingest_msf_pdf(
@@ -187,26 +400,27 @@ def ingest_msf_pdf(
     collection_name: str = "msf_index",
     doc_id: Optional[str] = None,
     render_dpi: Optional[int] = 300,
+    max_workers: Optional[int] = None,
 ) -> int:
     """Ingest an MSF PDF using the pdf_loader, preserving page labels and numbers.
 
+    Page ranges are rendered and OCR'd in parallel worker processes.
     Returns number of chunks inserted.
     """
-    from pathlib import Path as _Path
-    from pdf_loader import process_pdf as _process_pdf
-
-    p = _Path(pdf_path)
+    p = Path(pdf_path)
     out_json = p.with_suffix(".chunks.json")
     img_dir = p.parent / f"{p.stem}_images"
     # Use smaller chunk size to improve recall
-    chunks = _process_pdf(p, out_json, img_dir, chunk_size=400, render_pages_dpi=render_dpi)
+    chunks = _process_pdf_parallel(p, out_json, img_dir, render_dpi, max_workers)
 
-    client = get_chroma_client(get_default_chroma_dir())
-    col = get_or_create_collection(client, collection_name)
+    col = _col_for(get_default_chroma_dir(), collection_name)
 
-    ids: List[str] = []
-    docs: List[str] = []
-    metas: List[Dict[str, Any]] = []
+    # One slot per loader chunk (upper bound); trimmed after empty chunks are skipped.
+    upper = len(chunks)
+    ids: List[Any] = [None] * upper
+    docs: List[Any] = [None] * upper
+    metas: List[Any] = [None] * upper
+    fill = 0
     base_doc_id = doc_id or p.stem
 
     for idx, ch in enumerate(chunks):
@@ -217,9 +431,9 @@ def ingest_msf_pdf(
         page_label = ch.get("page_label") or ""
         title = ch.get("title") or ""
         cid = f"msf_{base_doc_id}_{idx:05d}"
-        ids.append(cid)
-        docs.append(text)
-        metas.append({
+        ids[fill] = cid
+        docs[fill] = text
+        metas[fill] = {
             "doc_id": base_doc_id,
             "division": "",
             "section_code": "",
@@ -230,8 +444,10 @@ def ingest_msf_pdf(
             "page_label": page_label,
             "source_type": "MSF",
             "hash": _sha256(text),
-        })
+        }
+        fill += 1
 
+    del ids[fill:], docs[fill:], metas[fill:]
     if ids:
         add_documents_to_collection(col, ids, docs, metas, batch_size=100)
     return len(ids)
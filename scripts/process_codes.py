@@ -1,14 +1,25 @@
 from __future__ import annotations
 
 import argparse
+import atexit
 import hashlib
 import json
+import mmap
+import multiprocessing
 import os
 import re
 import sys
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime, timezone
+from functools import partial
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+try:  # optional (not in requirements.txt): compress stored code text; readers decode via text_codec
+    import zstandard as zstd  # type: ignore
+except Exception:
+    zstd = None  # type: ignore
 
 
 def _project_root() -> str:
@@ -65,17 +76,39 @@ def _init_firebase() -> "firestore.Client":
     return firestore.client()
 
 
-def _read_text_file(p: Path) -> str:
+_CODE_TOKEN_RE_BYTES = re.compile(rb"\b(\d{3,4}(?:\.\d+)+)\b")
+
+
+def _scan_code_file(p: Path, want_token: bool, want_text: bool = True) -> Tuple[str, str, str]:
+    """Return ``(raw, code_token, text_hash)`` for a code file.
+
+    The file is memory-mapped so the token search and SHA-1 run over the bytes
+    directly; only ``raw`` is decoded, with newlines normalised as ``read_text``
+    would, and only when ``want_text`` is set. Empty/unreadable files yield
+    ``("", "", "")``.
+
+    ``text_hash`` is the SHA-1 of the file bytes, not of the decoded text, so a
+    CRLF-only edit counts as a change. Fingerprints stored before this hash was
+    introduced never match it: the first run afterwards rewrites every code once.
+    """
     try:
-        return p.read_text(encoding="utf-8", errors="ignore")
+        with p.open("rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return "", "", ""
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                m = _CODE_TOKEN_RE_BYTES.search(mm) if want_token else None
+                code_token = m.group(1).decode("ascii") if m else ""
+                text_hash = hashlib.sha1(mm).hexdigest()
+                data = mm[:] if want_text else b""
     except Exception:
-        try:
-            return p.read_text(encoding="latin-1", errors="ignore")
-        except Exception:
-            return ""
+        return "", "", ""
+    if not want_text:
+        return "", code_token, text_hash
+    raw = data.decode("utf-8", errors="ignore").replace("\r\n", "\n").replace("\r", "\n")
+    return raw, code_token, text_hash
 
 
-_CODE_TOKEN_RE = re.compile(r"\b(\d{3,4}(?:\.\d+)+)\b")
+_UFGS_DIGITS = re.compile(r"\d{2}")
 
 
 def _extract_ufgs_token_from_name(name: str) -> str:
@@ -85,19 +118,8 @@ def _extract_ufgs_token_from_name(name: str) -> str:
       UFGS-46-51-00-00-10)
     - Falls back to empty string if no two-digit groups are found.
     """
-    digits = re.findall(r"\d{2}", name or "")
-    if not digits:
-        return ""
-    return "UFGS-" + "-".join(digits)
-
-
-def _extract_code_token(text: str) -> str:
-    m = _CODE_TOKEN_RE.search(text or "")
-    return m.group(1) if m else ""
-
-
-def _text_hash(s: str) -> str:
-    return hashlib.sha1((s or "").encode("utf-8")).hexdigest()
+    parts = [m.group() for m in _UFGS_DIGITS.finditer(name or "")]
+    return "UFGS-" + "-".join(parts) if parts else ""
 
 
 _YES_PATTERNS = [
@@ -117,85 +139,269 @@ _NO_PATTERNS = [
     r"\breferences?\b",
     r"\badministration\b",
 ]
+# One alternation per verdict so each rule set is a single scan over the text.
+_YES_RE = re.compile("|".join(f"(?:{p})" for p in _YES_PATTERNS), re.IGNORECASE)
+_NO_RE = re.compile("|".join(f"(?:{p})" for p in _NO_PATTERNS), re.IGNORECASE)
+
+_RAG_KEYWORDS = [
+    "aha",
+    "jha",
+    "hazard analysis",
+    "permit-required confined space",
+    "hot work",
+    "excavation",
+    "crane",
+    "fall protection",
+    "demolition",
+]
+_RAG_KW_RE = re.compile("|".join(re.escape(k) for k in _RAG_KEYWORDS), re.IGNORECASE)
 
 
 def _rules_decide_requires_aha(text: str) -> Tuple[Optional[bool], float, str]:
-    s = (text or "").lower()
-    for pat in _YES_PATTERNS:
-        if re.search(pat, s, re.IGNORECASE):
-            return True, 0.95, "Rule-based positive trigger"
-    for pat in _NO_PATTERNS:
-        if re.search(pat, s, re.IGNORECASE):
-            return False, 0.9, "Rule-based administrative/definitions section"
+    s = text or ""
+    if _YES_RE.search(s):
+        return True, 0.95, "Rule-based positive trigger"
+    if _NO_RE.search(s):
+        return False, 0.9, "Rule-based administrative/definitions section"
     return None, 0.0, "Ambiguous"
 
 
-def _rag_citations_for(text: str, collection_name: Optional[str]) -> List[Dict[str, Any]]:
+# (collection_name, kind, query) -> (ids, metadatas); bounded, oldest evicted first.
+_QUERY_CACHE: Dict[Tuple[Optional[str], str, Any], Tuple[List[str], List[Any]]] = {}
+_QUERY_CACHE_MAX = 4096
+
+
+def _cache_put(key: Tuple[Optional[str], str, Any], value: Tuple[List[str], List[Any]]) -> None:
+    if len(_QUERY_CACHE) >= _QUERY_CACHE_MAX:
+        del _QUERY_CACHE[next(iter(_QUERY_CACHE))]
+    _QUERY_CACHE[key] = value
+
+
+def _rag_citations_batch(texts: List[str], collection_name: Optional[str]) -> List[List[Dict[str, Any]]]:
+    """Retrieve supporting citations for several code texts with one Chroma round trip each.
+
+    All vector queries go out as a single ``query_texts`` batch and all keyword
+    searches share one collection scan; results are index-aligned with ``texts``.
+    Identical queries (common across boilerplate sections) are sent and embedded
+    once and reused from ``_QUERY_CACHE``.
+    """
     from utils import (
         get_chroma_client,
         get_default_chroma_dir,
         get_or_create_collection,
-        query_collection,
-        keyword_search_collection,
+        query_collection_batch,
+        keyword_search_collection_batch,
         build_section_search_terms,
     )
 
+    if not texts:
+        return []
     client = get_chroma_client(get_default_chroma_dir())
     col = get_or_create_collection(client, collection_name)
 
-    # Build a broad query using detected terms
-    terms = build_section_search_terms(text or "")
-    q = " ".join(terms[:20]) or (text[:200] if text else "EM 385 requirements")
-    res_vec = query_collection(col, q, n_results=10)
-    res_kw = keyword_search_collection(col, terms[:20], max_results=10)
-
-    ids = [*res_vec.get("ids", [[]])[0]]
-    metas = [*res_vec.get("metadatas", [[]])[0]]
-    seen = set(ids)
-    for i, id_ in enumerate(res_kw.get("ids", [[]])[0]):
-        if id_ not in seen:
-            ids.append(id_)
-            metas.append(res_kw.get("metadatas", [[]])[0][i])
-            seen.add(id_)
-
-    citations: List[Dict[str, Any]] = []
-    for m in metas[:5]:
-        m = m or {}
-        citations.append({
-            "section_path": str(m.get("section_path") or m.get("headers") or m.get("title") or ""),
-            "page_label": str(m.get("page_label") or ""),
-            "page_number": m.get("page_number") if isinstance(m.get("page_number"), int) else None,
-            "quote_anchor": str(m.get("quote_anchor") or ""),
-            "source_url": str(m.get("source_url") or ""),
-        })
-    return citations
-
-
-def _rag_decide_requires_aha(text: str, collection_name: Optional[str]) -> Tuple[bool, float, str, List[Dict[str, Any]]]:
-    # Lightweight RAG heuristic using retrieved context only (no LLM in v1)
-    citations = _rag_citations_for(text, collection_name)
-    s = (text or "").lower()
-    positive = any(k in s for k in ["aha", "jha", "hazard analysis", "permit-required confined space", "hot work", "excavation", "crane", "fall protection", "demolition"])  # heuristic
+    # Build a broad query per text using detected terms
+    terms_list = [build_section_search_terms(text or "")[:20] for text in texts]
+    queries = [
+        " ".join(terms) or (text[:200] if text else "EM 385 requirements")
+        for terms, text in zip(terms_list, texts)
+    ]
+    vec_keys = [(collection_name, "vec", q) for q in queries]
+    kw_keys = [(collection_name, "kw", tuple(terms)) for terms in terms_list]
+
+    # Results for this call live in ``found``; _QUERY_CACHE is only filled as a
+    # side effect, so evictions from it can never drop a key needed below.
+    found: Dict[Tuple[Optional[str], str, Any], Tuple[List[str], List[Any]]] = {}
+    for key in (*vec_keys, *kw_keys):
+        hit = _QUERY_CACHE.get(key)
+        if hit is not None:
+            found[key] = hit
+
+    vec_missing = list(dict.fromkeys(k for k in vec_keys if k not in found))
+    if vec_missing:
+        res_vec = query_collection_batch(col, [k[2] for k in vec_missing], n_results=10)
+        for j, key in enumerate(vec_missing):
+            found[key] = ((res_vec.get("ids") or [])[j], (res_vec.get("metadatas") or [])[j])
+            _cache_put(key, found[key])
+    kw_missing = list(dict.fromkeys(k for k in kw_keys if k not in found))
+    if kw_missing:
+        res_kw = keyword_search_collection_batch(col, [list(k[2]) for k in kw_missing], max_results=10)
+        for j, key in enumerate(kw_missing):
+            found[key] = (res_kw["ids"][j], res_kw["metadatas"][j])
+            _cache_put(key, found[key])
+
+    out: List[List[Dict[str, Any]]] = []
+    for vec_key, kw_key in zip(vec_keys, kw_keys):
+        vec_ids, vec_metas = found[vec_key]
+        kw_ids, kw_metas = found[kw_key]
+        ids = [*vec_ids]
+        metas = [*vec_metas]
+        seen = set(ids)
+        for i, id_ in enumerate(kw_ids):
+            if id_ not in seen:
+                ids.append(id_)
+                metas.append(kw_metas[i])
+                seen.add(id_)
+
+        citations: List[Dict[str, Any]] = []
+        for m in metas[:5]:
+            m = m or {}
+            citations.append({
+                "section_path": str(m.get("section_path") or m.get("headers") or m.get("title") or ""),
+                "page_label": str(m.get("page_label") or ""),
+                "page_number": m.get("page_number") if isinstance(m.get("page_number"), int) else None,
+                "quote_anchor": str(m.get("quote_anchor") or ""),
+                "source_url": str(m.get("source_url") or ""),
+            })
+        out.append(citations)
+    return out
+
+
+def _rag_decide_requires_aha(text: str) -> Tuple[bool, float, str]:
+    # Lightweight RAG heuristic using retrieved context only (no LLM in v1).
+    # The keyword test decides; citations for positives are fetched in one
+    # batched Chroma pass by ``process_codes``.
+    positive = bool(_RAG_KW_RE.search(text or ""))  # heuristic
     if positive:
-        return True, 0.7, "RAG-backed heuristic positive", citations
-    return False, 0.6, "RAG-backed heuristic negative", citations
+        return True, 0.7, "RAG-backed heuristic positive"
+    return False, 0.6, "RAG-backed heuristic negative"
+
+
+# Firestore rejects commits over 10 MiB and documents over 1 MiB; stay below both.
+_MAX_BATCH_BYTES = 8 << 20
+_MAX_DOC_BYTES = 1_000_000
+
+
+def _approx_size(value: Any) -> int:
+    """Rough Firestore storage size of ``value``; strings and blobs dominate."""
+    if isinstance(value, str):
+        return len(value.encode("utf-8")) + 1
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    if isinstance(value, dict):
+        return sum(len(str(k)) + 1 + _approx_size(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return sum(_approx_size(v) for v in value)
+    return 8
+
+
+class BufferedFirestoreWriter:
+    """Buffer ``set(..., merge=True)`` calls into Firestore ``WriteBatch`` commits.
+
+    Firestore caps a batch at 500 writes and a commit at 10 MiB; pending writes
+    are committed every ``max_ops`` operations or ``max_bytes`` of payload, and
+    once more when the context exits. Commits run on a single background thread
+    (so they stay in order) while the caller keeps assembling the next batch; at
+    most ``max_in_flight`` batches are queued. A failed commit is logged and
+    counted in ``failed_writes``; the batches behind it still go out.
+    """
 
+    def __init__(
+        self,
+        db: "firestore.Client",
+        max_ops: int = 400,
+        max_bytes: int = _MAX_BATCH_BYTES,
+        max_in_flight: int = 2,
+    ) -> None:
+        self.db = db
+        self.max_ops = max_ops
+        self.max_bytes = max_bytes
+        self.max_in_flight = max_in_flight
+        self.failed_writes = 0
+        self._batch = None
+        self._pending = 0
+        self._bytes = 0
+        self._committer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="firestore-commit")
+        self._in_flight: Deque[Future] = deque()
+
+    def __enter__(self) -> "BufferedFirestoreWriter":
+        return self
+
+    def __exit__(self, *_exc: Any) -> None:
+        try:
+            self.flush()
+            self._drain(0)
+        finally:
+            self._committer.shutdown(wait=True)
+
+    def upsert(self, collection: str, doc_id: str, payload: Dict[str, Any]) -> None:
+        self.upsert_all([(collection, doc_id, payload)])
+
+    def upsert_all(self, writes: List[Tuple[str, str, Dict[str, Any]]]) -> None:
+        """Queue ``writes`` in one batch so they commit (or fail) together."""
+        size = sum(_approx_size(payload) for _, _, payload in writes)
+        if self._pending and (
+            self._pending + len(writes) > self.max_ops or self._bytes + size > self.max_bytes
+        ):
+            self.flush()
+        if self._batch is None:
+            self._batch = self.db.batch()
+        for collection, doc_id, payload in writes:
+            self._batch.set(self.db.collection(collection).document(doc_id), payload, merge=True)
+        self._pending += len(writes)
+        self._bytes += size
+        if self._pending >= self.max_ops:
+            self.flush()
+
+    def set_now(self, collection: str, doc_id: str, payload: Dict[str, Any]) -> bool:
+        """Write one document outside the batches so its failure stays its own."""
+        try:
+            self.db.collection(collection).document(doc_id).set(payload, merge=True)
+        except Exception as e:
+            print(f"[codes] Failed to write {collection}/{doc_id}: {e}")
+            return False
+        return True
+
+    def flush(self) -> None:
+        if self._batch is not None and self._pending:
+            self._in_flight.append(self._committer.submit(self._commit, self._batch, self._pending))
+            self._drain(self.max_in_flight)
+        self._batch = None
+        self._pending = 0
+        self._bytes = 0
+
+    def _commit(self, batch: Any, n_writes: int) -> None:
+        try:
+            batch.commit()
+        except Exception as e:
+            self.failed_writes += n_writes
+            print(f"[codes] Firestore batch commit failed, {n_writes} writes lost: {e}")
+
+    def _drain(self, keep: int) -> None:
+        while len(self._in_flight) > keep:
+            self._in_flight.popleft().result()
 
-def _upsert_code_doc(db: "firestore.Client", code_token: str, title: str, text_hash: str, source_path: str) -> None:
-    doc_ref = db.collection("codes").document(code_token)
-    payload = {
+
+def _code_doc(code_token: str, title: str, text_hash: str, source_path: str, inserted_at: str) -> Dict[str, Any]:
+    return {
         "code_token": code_token,
         "title": title,
         "text_hash": text_hash,
         "source_path": source_path,
-        "inserted_at": datetime.now(timezone.utc).isoformat(),
+        "inserted_at": inserted_at,
     }
-    doc_ref.set(payload, merge=True)
 
 
-def _write_decision(db: "firestore.Client", code_token: str, decision: Dict[str, Any]) -> None:
-    doc_ref = db.collection("decisions").document(code_token)
-    doc_ref.set(decision, merge=True)
+_ZSTD_CCTX = zstd.ZstdCompressor(level=3) if zstd is not None else None
+
+
+def _code_text_payload(raw: str, section_type: str) -> Dict[str, Any]:
+    """Build the stored-text fields for a code doc.
+
+    With ``zstandard`` installed the text is kept as a zstd blob (``text_zst``)
+    and the plain ``text`` field is removed; otherwise plain UTF-8 is stored.
+    ``text_size`` is the length of the decoded text in characters, not bytes.
+    """
+    if _ZSTD_CCTX is None:
+        return {"text": raw, "text_codec": "plain", "section_type": section_type}
+    from firebase_admin import firestore
+
+    return {
+        "text_zst": _ZSTD_CCTX.compress(raw.encode("utf-8")),
+        "text_codec": "zstd-3",
+        "text_size": len(raw),
+        "text": firestore.DELETE_FIELD,
+        "section_type": section_type,
+    }
 
 
 def _guess_title(text: str) -> str:
@@ -206,74 +412,222 @@ def _guess_title(text: str) -> str:
     return ""
 
 
-def process_codes(input_dir: str, em385_version: str, model_version: str, codepack_version: str, collection_name: Optional[str]) -> None:
+_CODE_SUFFIXES = frozenset({".sec", ".txt"})
+
+
+def _identify(p: Path) -> Optional[Tuple[str, str, str, str]]:
+    """Return ``(code_token, section_type, text_hash, raw)`` for a code file.
+
+    ``None`` for empty/unreadable files; ``code_token`` is empty when no section
+    token can be derived.
+    """
+    # Determine token:
+    # - For UFGS .SEC files, ALWAYS use filename-derived UFGS token to ensure one doc per section
+    # - Otherwise (e.g., EM385 split text), use first dotted token as EM385 code
+    is_ufgs = p.suffix.lower() == ".sec"
+    raw, em_code, text_hash = _scan_code_file(p, want_token=not is_ufgs)
+    if not raw:
+        return None
+    code_token, section_type = _resolve_token(p, is_ufgs, em_code)
+    return code_token, section_type, text_hash, raw
+
+
+def _resolve_token(p: Path, is_ufgs: bool, em_code: str) -> Tuple[str, str]:
+    """``(code_token, section_type)`` from the filename (UFGS) or the first dotted token."""
+    ufgs_token = _extract_ufgs_token_from_name(p.stem) if is_ufgs else ""
+    if ufgs_token:
+        return ufgs_token, "UFGS"
+    if em_code:
+        return f"385-{em_code}", "EM385"
+    return "", "UFGS" if is_ufgs else "EM385"
+
+
+def _fingerprint_one(p: Path) -> Optional[Tuple[str, str]]:
+    """Worker: ``(code_token, text_hash)`` for the unchanged-file precheck.
+
+    Only the token search and SHA-1 run over the mapped bytes; the text is not
+    decoded here since most files are expected to be skipped.
+    """
+    is_ufgs = p.suffix.lower() == ".sec"
+    _, em_code, text_hash = _scan_code_file(p, want_token=not is_ufgs, want_text=False)
+    if not text_hash:
+        return None
+    return _resolve_token(p, is_ufgs, em_code)[0], text_hash
+
+
+def _existing_fingerprints(db: "firestore.Client", code_tokens: List[str]) -> Dict[str, Tuple[Any, ...]]:
+    """Fetch ``(text_hash, em385_version, model_version, codepack_version)`` per stored code.
+
+    Uses one ``get_all`` per collection rather than a ``get`` per file; codes
+    missing either document are left out so they are always rewritten.
+    """
+    if not code_tokens:
+        return {}
+    hashes: Dict[str, Any] = {}
+    code_refs = [db.collection("codes").document(t) for t in code_tokens]
+    for snap in db.get_all(code_refs, field_paths=["text_hash"]):
+        if snap.exists:
+            hashes[snap.id] = (snap.to_dict() or {}).get("text_hash")
+    versions: Dict[str, Tuple[Any, ...]] = {}
+    decision_refs = [db.collection("decisions").document(t) for t in code_tokens]
+    for snap in db.get_all(decision_refs, field_paths=["em385_version", "model_version", "codepack_version"]):
+        if snap.exists:
+            d = snap.to_dict() or {}
+            versions[snap.id] = (d.get("em385_version"), d.get("model_version"), d.get("codepack_version"))
+    return {t: (h, *versions[t]) for t, h in hashes.items() if t in versions}
+
+
+def _process_one(
+    p: Path,
+    em385_version: str,
+    model_version: str,
+    codepack_version: str,
+    run_ts: str,
+) -> Optional[Tuple[str, str, str, str, str, Dict[str, Any], bool]]:
+    """Read, tokenise and classify a single code file.
+
+    Runs inside a worker process and touches neither Firestore nor Chroma.
+    Returns ``None`` for empty/unreadable files and an empty ``code_token`` when
+    no section token can be derived; otherwise ``(code_token, title, text_hash,
+    raw, section_type, decision_doc, needs_citations)``.
+    """
+    ident = _identify(p)
+    if ident is None:
+        return None
+    code_token, section_type, text_hash, raw = ident
+    if not code_token:
+        return "", "", "", raw, section_type, {}, False
+
+    title = _guess_title(raw)
+
+    # Decide requires AHA
+    requires: Optional[bool]
+    requires, confidence, rationale = _rules_decide_requires_aha(raw)
+    needs_citations = False
+    if requires is None:
+        requires, confidence, rationale = _rag_decide_requires_aha(raw)
+        needs_citations = requires
+
+    decision_doc = {
+        "requiresAha": bool(requires),
+        "confidence": float(confidence),
+        "rationale": rationale,
+        "citations": [],
+        "em385_version": em385_version,
+        "model_version": model_version,
+        "codepack_version": codepack_version,
+        "updated_at": run_ts,
+    }
+    return code_token, title, text_hash, raw, section_type, decision_doc, needs_citations
+
+
+def process_codes(
+    input_dir: str,
+    em385_version: str,
+    model_version: str,
+    codepack_version: str,
+    collection_name: Optional[str],
+    max_workers: Optional[int] = None,
+    force: bool = False,
+) -> None:
     db = _init_firebase()
     base = Path(input_dir)
     if not base.exists():
         print(f"[codes] Input directory not found: {base}")
         return
 
-    files: List[Path] = []
-    for ext in (".SEC", ".sec", ".txt"):
-        files.extend(base.rglob(f"*{ext}"))
+    # Single walk; suffix match is case-insensitive so .SEC/.sec never double-count
+    files: List[Path] = [
+        p for p in base.rglob("*") if p.suffix.lower() in _CODE_SUFFIXES and p.is_file()
+    ]
 
     print(f"[codes] Found {len(files)} files")
 
-    for p in sorted(files):
-        raw = _read_text_file(p)
-        if not raw:
-            continue
-        # Determine token:
-        # - For UFGS .SEC files, ALWAYS use filename-derived UFGS token to ensure one doc per section
-        # - Otherwise (e.g., EM385 split text), use first dotted token as EM385 code
-        section_type = "UFGS" if p.suffix.lower() == ".sec" else "EM385"
-        ufgs_token = _extract_ufgs_token_from_name(p.stem) if section_type == "UFGS" else ""
-        em_code = _extract_code_token(raw) if section_type != "UFGS" else ""
-        if section_type == "UFGS" and ufgs_token:
-            code_token = ufgs_token
-        elif em_code:
-            code_token = f"385-{em_code}"
-            section_type = "EM385"
-        else:
-            print(f"[codes] Skip {p.name}: no section token found")
-            continue
-
-        text_hash = _text_hash(raw)
-        title = _guess_title(raw)
-
-        _upsert_code_doc(db, code_token, title, text_hash, str(p))
-        # Store full text for auditability
-        try:
-            db.collection("codes").document(code_token).set({
-                "text": raw,
-                "section_type": section_type,
-            }, merge=True)
-        except Exception:
-            pass
-
-        # Decide requires AHA
-        requires: Optional[bool]
-        requires, confidence, rationale = _rules_decide_requires_aha(raw)
-        citations: List[Dict[str, Any]] = []
-        if requires is None:
-            req, conf, rat, cits = _rag_decide_requires_aha(raw, collection_name)
-            requires = req
-            confidence = conf
-            rationale = rat
-            citations = cits
-
-        decision_doc = {
-            "requiresAha": bool(requires),
-            "confidence": float(confidence),
-            "rationale": rationale,
-            "citations": citations,
-            "em385_version": em385_version,
-            "model_version": model_version,
-            "codepack_version": codepack_version,
-            "updated_at": datetime.now(timezone.utc).isoformat(),
-        }
-        _write_decision(db, code_token, decision_doc)
-        print(f"[codes] {code_token}: requiresAha={decision_doc['requiresAha']} conf={decision_doc['confidence']:.2f}")
+    ordered = sorted(files)
+    # One timestamp per run: every inserted_at/updated_at written below shares it.
+    run_ts = datetime.now(timezone.utc).isoformat()
+    worker = partial(
+        _process_one,
+        em385_version=em385_version,
+        model_version=model_version,
+        codepack_version=codepack_version,
+        run_ts=run_ts,
+    )
+    # Files are independent, so read/tokenise/classify fans out across processes
+    # while Firestore writes stay on this process. "spawn" keeps workers from
+    # inheriting the Firebase/gRPC state created above.
+    with ProcessPoolExecutor(
+        max_workers=max_workers or os.cpu_count() or 1,
+        mp_context=multiprocessing.get_context("spawn"),
+    ) as executor, BufferedFirestoreWriter(db) as writer:
+        pending = ordered
+        if not force:
+            # Idempotent re-ingest: drop files whose text and version labels
+            # already match Firestore before paying for classification/writes.
+            fingerprints = list(executor.map(_fingerprint_one, ordered, chunksize=8))
+            existing = _existing_fingerprints(db, sorted({fp[0] for fp in fingerprints if fp and fp[0]}))
+            versions = (em385_version, model_version, codepack_version)
+            pending = [
+                p for p, fp in zip(ordered, fingerprints)
+                if not (fp and fp[0] and existing.get(fp[0]) == (fp[1], *versions))
+            ]
+            if len(pending) < len(ordered):
+                print(f"[codes] Skipping {len(ordered) - len(pending)} unchanged files")
+
+        # RAG-positive codes wait for one batched citation lookup; their code doc
+        # is written with the decision, in the same batch, so a failed commit
+        # never leaves a fresh text_hash beside a stale decision.
+        needs_cites: List[Tuple[Path, str, str, str, str, str, Dict[str, Any]]] = []
+        for p, result in zip(pending, executor.map(worker, pending, chunksize=8)):
+            if result is None:
+                continue
+            code_token, title, text_hash, raw, section_type, decision_doc, needs_citations = result
+            if not code_token:
+                print(f"[codes] Skip {p.name}: no section token found")
+                continue
+            if needs_citations:
+                needs_cites.append((p, code_token, title, text_hash, raw, section_type, decision_doc))
+                continue
+            _write_code(writer, run_ts, p, code_token, title, text_hash, raw, section_type, decision_doc)
+
+        if needs_cites:
+            print(f"[codes] Fetching citations for {len(needs_cites)} RAG-positive codes")
+            all_citations = _rag_citations_batch([item[4] for item in needs_cites], collection_name)
+            for item, citations in zip(needs_cites, all_citations):
+                item[6]["citations"] = citations
+                _write_code(writer, run_ts, *item)
+
+    if writer.failed_writes:
+        print(f"[codes] {writer.failed_writes} Firestore writes failed; rerun to retry them")
+
+
+def _write_code(
+    writer: BufferedFirestoreWriter,
+    run_ts: str,
+    p: Path,
+    code_token: str,
+    title: str,
+    text_hash: str,
+    raw: str,
+    section_type: str,
+    decision_doc: Dict[str, Any],
+) -> None:
+    code_doc = _code_doc(code_token, title, text_hash, str(p), run_ts)
+    writes = [("codes", code_token, code_doc)]
+    # Store full text for auditability; a text too large to batch is written on
+    # its own so an oversized document fails alone instead of sinking a batch.
+    text_payload = _code_text_payload(raw, section_type)
+    if _approx_size(text_payload) > _MAX_DOC_BYTES:
+        if not writer.set_now("codes", code_token, text_payload):
+            # Keep the stored text_hash stale so the next run retries this file
+            del code_doc["text_hash"]
+    else:
+        writes.append(("codes", code_token, text_payload))
+    # The code doc (with text_hash) and the decision share one batch: the
+    # unchanged-file precheck relies on never seeing one without the other.
+    writes.append(("decisions", code_token, decision_doc))
+    writer.upsert_all(writes)
+    print(f"[codes] {code_token}: requiresAha={decision_doc['requiresAha']} conf={decision_doc['confidence']:.2f}")
 
 
 def _parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
@@ -283,17 +637,28 @@ def _parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
     ap.add_argument("--model-version", required=True, help="Model version label, e.g., gpt-4o-mini")
     ap.add_argument("--codepack", dest="codepack_version", required=True, help="Codepack version label, e.g., v1")
     ap.add_argument("--collection", dest="collection_name", default=None, help="Chroma collection name (optional)")
+    ap.add_argument("--workers", dest="max_workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    ap.add_argument("--force", action="store_true", help="Rewrite codes/decisions even when text and versions are unchanged")
     return ap.parse_args(argv)
 
 
 def main() -> int:
     args = _parse_args()
+    # One status line per file: block-buffer stdout (64 KiB) instead of a write per line.
+    sys.stdout.flush()
+    sys.stdout = open(
+        sys.stdout.fileno(), "w", buffering=1 << 16, encoding=sys.stdout.encoding,
+        errors=sys.stdout.errors, closefd=False,
+    )
+    atexit.register(sys.stdout.flush)
     process_codes(
         input_dir=args.input,
         em385_version=args.em385_version,
         model_version=args.model_version,
         codepack_version=args.codepack_version,
         collection_name=args.collection_name,
+        max_workers=args.max_workers,
+        force=args.force,
     )
     return 0
 
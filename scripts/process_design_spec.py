@@ -1,16 +1,69 @@
 from __future__ import annotations
 
 import argparse
+import copy
 import csv
+import functools
+import hashlib
 import json
 import os
 import re
 import sys
 from dataclasses import dataclass, field
 import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Dict, FrozenSet, Iterable, Iterator, List, NamedTuple, Optional, Set, Tuple
+
+try:  # optional: linear-time multi-pattern scan for plan triggers
+    import ahocorasick  # type: ignore
+except Exception:
+    ahocorasick = None  # type: ignore
+
+try:  # optional: faster manifest serialization, written straight as UTF-8 bytes
+    import orjson  # type: ignore
+except Exception:
+    orjson = None  # type: ignore
+
+# Retrieval helpers and generators used per code/activity; resolved once at import
+# rather than on every call. Each is None when its dependencies are not installed.
+try:
+    from utils import (
+        build_section_search_terms,
+        get_chroma_client,
+        get_default_chroma_dir,
+        get_or_create_collection,
+        keyword_search_collection,
+        query_collection,
+        query_collection_batch,
+    )
+except Exception as _e:
+    build_section_search_terms = get_chroma_client = get_default_chroma_dir = None  # type: ignore
+    get_or_create_collection = keyword_search_collection = query_collection = None  # type: ignore
+    query_collection_batch = None  # type: ignore
+    _UTILS_IMPORT_ERROR: Optional[BaseException] = _e
+else:
+    _UTILS_IMPORT_ERROR = None
+
+try:
+    from generators.aha import generate_full_aha
+except Exception as _e:
+    generate_full_aha = None  # type: ignore
+    _AHA_IMPORT_ERROR: Optional[BaseException] = _e
+else:
+    _AHA_IMPORT_ERROR = None
+
+try:
+    from generators.activity_detect import detect_activities
+except Exception:
+    detect_activities = None  # type: ignore
+
+
+def _require(dep: Any, error: Optional[BaseException], name: str) -> None:
+    if dep is None:
+        raise ImportError(f"{name} is unavailable: {error}") from error
 
 
 def _project_root() -> str:
@@ -67,29 +120,34 @@ def _init_firebase() -> "firestore.Client":
 
 
 def _read_text_file(p: Path) -> str:
+    # A lenient utf-8 decode cannot fail, so a single read covers text and binary
+    # input alike; only I/O errors are left, and re-reading would not help those.
     try:
-        return p.read_text(encoding="utf-8", errors="ignore")
+        with p.open("r", encoding="utf-8", errors="ignore") as f:
+            return f.read()
     except Exception:
-        try:
-            return p.read_text(encoding="latin-1", errors="ignore")
-        except Exception:
-            return ""
+        return ""
 
 
 def _read_pdf_text_with_ocr_fallback(pdf_path: Path, ocr_threshold: int = 100, diag_dir: Optional[Path] = None) -> str:
     # Primary: extract visible text (and tables) fast
     from pdf_loader.pdf_text import extract_text
     pages = extract_text(pdf_path, include_tables=True, diagnostic_dir=(diag_dir / "text") if diag_dir else None)
-    combined = "\n\n".join([pages[k] for k in sorted(pages.keys())]) if pages else ""
-    if len(combined) >= max(0, ocr_threshold):
-        return combined
+    pages = pages or {}
+    # The would-be joined length (pages plus "\n\n" separators) is known without
+    # ordering or concatenating anything; only a passing text pass is joined.
+    total = sum(map(len, pages.values())) + 2 * max(0, len(pages) - 1)
+    if total >= max(0, ocr_threshold):
+        # extract_text inserts pages in ascending page order, so no sort is needed
+        return "\n\n".join(pages.values())
+    # The text pass is discarded; drop it before OCR so both results are never held at once
+    del pages
     # Fallback: OCR full document via orchestrator
     from pdf_loader import process_pdf
     tmp_json = (diag_dir / "chunks.json") if diag_dir else (pdf_path.with_suffix(".ocr.json"))
     tmp_imgdir = (diag_dir / "images") if diag_dir else (pdf_path.parent / (pdf_path.stem + "_images"))
     chunks = process_pdf(pdf_path, tmp_json, tmp_imgdir, diagnostic_dir=diag_dir)
-    texts = [str(c.get("text", "")) for c in chunks]
-    return "\n\n".join([t for t in texts if t])
+    return "\n\n".join(t for t in (str(c.get("text", "")) for c in chunks) if t)
 
 
 def _read_docx_text(docx_path: Path) -> str:
@@ -128,55 +186,113 @@ def _read_docx_text(docx_path: Path) -> str:
 
 
 CODE_RE = re.compile(r"385[-\s]?(\d+(?:\.\d+)*)")
-RANGE_RE = re.compile(r"\b(\d{3,4})\s*[–-]\s*(\d{3,4})\b")
+# Possessive quantifiers: a failed near-match (e.g. OCR digit runs) never backtracks
+# into the digits or whitespace, which could not change the outcome anyway.
+RANGE_RE = re.compile(r"\b(\d{3,4}+)\s*+[–-]\s*+(\d{3,4}+)\b")
 
 # UFGS section like "07 84 00" (optionally with trailing .xx groups we ignore for token)
 # UFGS section like "07 84 00" (accept only at line start or after 'SECTION ')
 UFGS_LINE_START_RE = re.compile(r"^(?:SECTION\s+)?(\d{2})\s+(\d{2})\s+(\d{2})(?:\b|\.|\s)")
 
 
-def _expand_ranges(text: str) -> List[str]:
-    """Expand numeric ranges only when clearly in EM 385 context to avoid explosion.
+def _iter_lines(text: str, block_chars: int = 1 << 18) -> Iterator[str]:
+    """Yield ``text.splitlines()`` lazily, one block at a time.
 
-    We require the token '385' to appear in the same line as the range to treat it as an EM 385 range.
+    Blocks are cut just after a newline (so a CRLF pair never straddles two
+    blocks), which keeps per-block ``splitlines`` identical to one over the whole
+    text while holding only one block's worth of line objects at a time.
     """
+    start, n = 0, len(text)
+    while start < n:
+        cut = text.find("\n", start + block_chars)
+        end = n if cut < 0 else cut + 1
+        yield from text[start:end].splitlines()
+        start = end
+
+
+def _em385_lines(text: str) -> List[str]:
+    """Lines that mention '385'; both code and range extraction only look at these."""
+    return [raw for raw in (text or "").splitlines() if "385" in raw]
+
+
+# Joins the '385' lines into one string so each pattern is one C-level scan rather
+# than a finditer call per line. Neither pattern can match NUL, and NUL is a non-word
+# character, so matches and \b boundaries are exactly those of a per-line scan.
+_LINE_SEP = "\0"
+
+
+def _ranges_in(blob: str) -> List[str]:
     out: List[str] = []
-    for raw in (text or "").splitlines():
-        if "385" not in raw:
-            continue
-        for m in RANGE_RE.finditer(raw):
-            a = int(m.group(1))
-            b = int(m.group(2))
-            lo, hi = (a, b) if a <= b else (b, a)
-            # Clamp to plausible EM385 numeric window to avoid degenerate expansions
-            if 1 <= lo <= 9999 and 1 <= hi <= 9999 and (hi - lo) <= 200:
-                for v in range(lo, hi + 1):
-                    out.append(f"385-{v}")
+    if "-" not in blob and "–" not in blob:
+        return out
+    for m in RANGE_RE.finditer(blob):
+        a = int(m.group(1))
+        b = int(m.group(2))
+        lo, hi = (a, b) if a <= b else (b, a)
+        # Clamp to plausible EM385 numeric window to avoid degenerate expansions
+        if 1 <= lo <= 9999 and 1 <= hi <= 9999 and (hi - lo) <= 200:
+            out.extend([f"385-{v}" for v in range(lo, hi + 1)])
     return out
 
 
-def _extract_codes(text: str) -> List[str]:
+def _expand_ranges(text: str, lines: Optional[List[str]] = None) -> List[str]:
+    """Expand numeric ranges only when clearly in EM 385 context to avoid explosion.
+
+    We require the token '385' to appear in the same line as the range to treat it as an EM 385 range.
+    """
+    return _ranges_in(_LINE_SEP.join(_em385_lines(text) if lines is None else lines))
+
+
+def _extract_codes(text: str, lines: Optional[List[str]] = None) -> List[str]:
     """Extract EM 385 codes conservatively using line-level context.
 
     - Only consider lines that mention '385' to reduce false positives.
     - Extract explicit tokens like 385-1016 and expand ranges on those lines.
     """
-    codes: List[str] = []
-    for raw in (text or "").splitlines():
-        if "385" not in raw:
-            continue
-        for m in CODE_RE.finditer(raw):
-            codes.append(f"385-{m.group(1)}")
+    # One split/filter pass feeds both patterns; they stay separate scans because
+    # a code and a range may overlap (e.g. "385-400" yields both).
+    if lines is None:
+        lines = _em385_lines(text)
+    blob = _LINE_SEP.join(lines)
+    codes = [f"385-{d}" for d in CODE_RE.findall(blob)]
     # ranges like 1012–1016 but only on lines that had '385'
-    codes.extend(_expand_ranges(text or ""))
+    codes.extend(_ranges_in(blob))
     # stable unique
-    seen = set()
-    out: List[str] = []
-    for c in codes:
-        if c not in seen:
-            seen.add(c)
-            out.append(c)
-    return out
+    return list(dict.fromkeys(codes))
+
+
+# Division 00 (procurement) and 01 (general requirements) are administrative
+_UFGS_ADMIN_DIVS = frozenset({"00", "01"})
+
+# ASCII bytes that are not letters; deleting them leaves only the letters to count
+_ASCII_NON_ALPHA = bytes(b for b in range(128) if not chr(b).isalpha())
+
+
+def _alpha_count(line: str) -> int:
+    """``sum(c.isalpha() for c in line)``, done in C for the common all-ASCII line."""
+    if line.isascii():
+        return len(line.encode("ascii").translate(None, _ASCII_NON_ALPHA))
+    return sum(map(str.isalpha, line))
+
+
+def _ufgs_token(line: str, include_admin: bool = False) -> Optional[str]:
+    """UFGS token for one stripped line, or None; see ``_extract_ufgs_codes``."""
+    # Tokens start with a digit or 'SECTION'; skip the regex on every other line
+    if not (line[:1].isdigit() or line.startswith("SECTION")):
+        return None
+    m = UFGS_LINE_START_RE.search(line)
+    if not m:
+        return None
+    # require some letters to avoid matching random date triplets (checked only
+    # once the cheap anchored match has succeeded)
+    if _alpha_count(line) < 6:
+        return None
+    a, b, c = m.group(1), m.group(2), m.group(3)
+    # Filter admin divisions unless explicitly included
+    if not include_admin and a in _UFGS_ADMIN_DIVS:
+        return None
+    # Normalize token
+    return f"UFGS-{a}-{b}-{c}"
 
 
 def _extract_ufgs_codes(text: str, include_admin: bool = False) -> List[str]:
@@ -186,47 +302,179 @@ def _extract_ufgs_codes(text: str, include_admin: bool = False) -> List[str]:
     - Work line-by-line; require at least some alpha text later in the line to indicate a title/section name.
     - Ignore obvious date fragments (e.g., lines dominated by MM/YY or change markers) by requiring >= 6 alpha characters in line.
     """
-    out: List[str] = []
-    seen = set()
-    for raw in (text or "").splitlines():
+    return _scan_design_text(text, include_admin_ufgs=include_admin)[1]
+
+
+def _scan_design_text(
+    text: str, include_admin_ufgs: bool = False
+) -> Tuple[List[str], List[str], Dict[str, str]]:
+    """Single pass over the spec lines returning ``(em385_codes, ufgs_codes, project_meta)``.
+
+    Each line is visited once and dispatched to the EM 385, UFGS and metadata
+    extractors instead of each splitting and walking the whole text itself.
+    """
+    em385_lines: List[str] = []
+    ufgs: Dict[str, None] = {}
+    meta = dict.fromkeys(("project_name", "project_number", "location", "owner", "gc"), "")
+    for raw in _iter_lines(text or ""):
+        if "385" in raw:
+            em385_lines.append(raw)
+        m = _META_RE.match(raw)
+        if m:
+            meta[_META_KEYS[m.group(1).lower()]] = m.group(2).strip()
         line = raw.strip()
-        if not line:
-            continue
-        # require some letters to avoid matching random date triplets
-        alpha_count = sum(1 for c in line if c.isalpha())
-        if alpha_count < 6:
-            continue
-        m = UFGS_LINE_START_RE.search(line)
-        if not m:
-            continue
-        a, b, c = m.group(1), m.group(2), m.group(3)
-        # Filter admin divisions unless explicitly included
-        if not include_admin and a in {"00", "01"}:
-            continue
-        # Normalize token and record
-        token = f"UFGS-{a}-{b}-{c}"
-        if token not in seen:
-            seen.add(token)
-            out.append(token)
-    return out
+        if line:
+            token = _ufgs_token(line, include_admin_ufgs)
+            if token:
+                ufgs[token] = None
+    return _extract_codes(text, em385_lines), list(ufgs), meta
+
+
+_ScanResult = Tuple[Tuple[str, ...], Tuple[str, ...], Tuple[Tuple[str, str], ...]]
+# (spec text digest, include_admin_ufgs) -> frozen scan; bounded, oldest evicted first.
+# Keyed on the digest so cached entries do not keep whole spec texts alive.
+_SCAN_CACHE: Dict[Tuple[bytes, bool], _ScanResult] = {}
+_SCAN_CACHE_MAX = 8
+
+
+def _text_digest(text: str) -> bytes:
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+
+def _scan_design_text_cached(text: str, digest: bytes, include_admin_ufgs: bool = False) -> _ScanResult:
+    """``_scan_design_text`` memoized by spec content (frozen; callers copy what they mutate).
+
+    Re-running the same spec in one process (classify-only then a full run, or
+    batch reruns) reuses the scan instead of walking the whole text again.
+    ``digest`` is ``_text_digest(text)``.
+    """
+    key = (digest, include_admin_ufgs)
+    hit = _SCAN_CACHE.get(key)
+    if hit is None:
+        em385, ufgs, meta = _scan_design_text(text, include_admin_ufgs)
+        hit = (tuple(em385), tuple(ufgs), tuple(meta.items()))
+        if len(_SCAN_CACHE) >= _SCAN_CACHE_MAX:
+            del _SCAN_CACHE[next(iter(_SCAN_CACHE))]
+        _SCAN_CACHE[key] = hit
+    return hit
+
+
+_SLUG_NONWORD = re.compile(r"[^a-z0-9\-\_]+")
+# ASCII-only labels (the usual case) are mapped in one C pass; same result as _SLUG_NONWORD
+_SLUG_ASCII_TABLE = str.maketrans({
+    c: "_" for c in range(128) if chr(c) not in "abcdefghijklmnopqrstuvwxyz0123456789-_"
+})
+
+
+def _write_json(path: Path, payload: Dict[str, Any]) -> None:
+    """Write ``payload`` as indented JSON without building an intermediate str."""
+    if orjson is not None:
+        data = None
+        # Plain str keys are the norm and serialize fastest; only retry with the
+        # (slower) non-str-key option when a payload actually needs it.
+        for option in (orjson.OPT_INDENT_2, orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS):
+            try:
+                data = orjson.dumps(payload, option=option)
+                break
+            except TypeError:
+                continue  # after both fail, json reports (or handles) the values orjson can't encode
+        if data is not None:
+            with path.open("wb") as f:
+                f.write(data)
+            return
+    with path.open("w", encoding="utf-8") as f:
+        json.dump(payload, f, indent=2)
 
 
 def _slug(s: str) -> str:
     s = (s or "").strip().lower()
-    s = re.sub(r"[^a-z0-9\-\_]+", "_", s)
-    s = re.sub(r"_+", "_", s).strip("_")
-    return s or "item"
+    s = s.translate(_SLUG_ASCII_TABLE) if s.isascii() else _SLUG_NONWORD.sub("_", s)
+    # Collapse underscore runs and trim them from both ends
+    return "_".join(filter(None, s.split("_"))) or "item"
+
+
+class PlanRow(NamedTuple):
+    """One safety-plan rule; matching fields are stripped and lowercased at load time."""
 
+    plan_name: str
+    trigger_type: str
+    pattern: str
+    requires_aha_activity: str
+    requires_code: str
 
-def _load_plans_csv(path: Path) -> List[Dict[str, str]]:
+
+class PlanRules(NamedTuple):
+    """Plan rules bucketed by trigger type and keyed by pattern.
+
+    Each bucket maps a pattern to the ``(csv_order, row)`` pairs it triggers so
+    matches can be emitted in the original CSV order. ``gates`` holds the distinct
+    ``(requires_aha_activity, requires_code)`` pairs so gating is checked once per
+    pair rather than once per row.
+    """
+
+    contains_text: Dict[str, List[Tuple[int, PlanRow]]]
+    aha_activity: Dict[str, List[Tuple[int, PlanRow]]]
+    code_present: Dict[str, List[Tuple[int, PlanRow]]]
+    gates: Set[Tuple[str, str]]
+
+
+_PLAN_TRIGGER_TYPES = ("contains_text", "aha_activity", "code_present")
+
+
+def _bucket_plans(rows: Iterable[PlanRow]) -> PlanRules:
+    rules = PlanRules({}, {}, {}, set())
+    for order, row in enumerate(rows):
+        # Unnamed rows, pattern-less rows and unknown trigger types never fire.
+        bucket = getattr(rules, row.trigger_type) if row.trigger_type in _PLAN_TRIGGER_TYPES else None
+        if bucket is None or not row.plan_name or not row.pattern:
+            continue
+        bucket.setdefault(row.pattern, []).append((order, row))
+        rules.gates.add((row.requires_aha_activity, row.requires_code))
+    return rules
+
+
+def _load_plans_csv(path: Path) -> PlanRules:
     if not path.exists():
-        return []
-    rows: List[Dict[str, str]] = []
+        return _bucket_plans(())
+    rows: List[PlanRow] = []
     with path.open("r", encoding="utf-8") as f:
-        r = csv.DictReader(f)
-        for row in r:
-            rows.append({k: (v or "").strip() for k, v in row.items()})
-    return rows
+        r = csv.reader(f)
+        header = next(r, None)
+        if header is None:
+            return _bucket_plans(())
+        index = {name: i for i, name in enumerate(header)}
+        cols = [index.get(name) for name in PlanRow._fields]
+        for rec in r:
+            if not rec:
+                continue
+            name, ttype, patt, req_act, req_code = (
+                (rec[i] if i is not None and i < len(rec) else "").strip() for i in cols
+            )
+            rows.append(PlanRow(name, ttype.lower(), patt.lower(), req_act.lower(), req_code))
+    return _bucket_plans(rows)
+
+
+# "<label>:" at line start (after whitespace); longer labels first so "project name"
+# is not taken as "project".
+_META_RE = re.compile(
+    r"\s*(project name|project number|project #|project no|project|location|owner|general contractor|gc):(.*)",
+    re.IGNORECASE,
+)
+_META_KEYS = {
+    "project name": "project_name",
+    "project": "project_name",
+    "project number": "project_number",
+    "project #": "project_number",
+    "project no": "project_number",
+    "location": "location",
+    "owner": "owner",
+    "general contractor": "gc",
+    "gc": "gc",
+}
+
+# Project fields the CSP/AHA Book placeholders draw on; the defaults count as unfilled
+_PLACEHOLDER_KEYS = ("project_name", "location", "owner", "gc")
+_PLACEHOLDER_DEFAULTS = frozenset({"project", "owner", "gc"})
 
 
 def _extract_project_meta(text: str) -> Dict[str, str]:
@@ -240,34 +488,86 @@ def _extract_project_meta(text: str) -> Dict[str, str]:
       Owner: X
       GC: Y
     """
-    meta = {
-        "project_name": "",
-        "project_number": "",
-        "location": "",
-        "owner": "",
-        "gc": "",
-    }
-    lines = (text or "").splitlines()
-    for raw in lines:
-        line = raw.strip()
-        low = line.lower()
-        def _val(prefix: str) -> str:
-            return line.split(":", 1)[1].strip() if ":" in line else line[len(prefix):].strip()
-        if low.startswith("project name:") or low.startswith("project:"):
-            meta["project_name"] = _val("project name:") if ":" in line.lower() else _val("project:")
-        elif low.startswith("project number:") or low.startswith("project #:") or low.startswith("project no:"):
-            meta["project_number"] = _val("project number:")
-        elif low.startswith("location:"):
-            meta["location"] = _val("location:")
-        elif low.startswith("owner:"):
-            meta["owner"] = _val("owner:")
-        elif low.startswith("gc:") or low.startswith("general contractor:"):
-            meta["gc"] = _val("gc:") if low.startswith("gc:") else _val("general contractor:")
-    return meta
-
-
-def _infer_activity_for_code(code_token: str, design_text: str, collection_name: Optional[str]) -> Optional[str]:
-    # Heuristic: match activities by keyword presence in design text + retrieved snippets near the code
+    return _scan_design_text(text)[2]
+
+
+@functools.lru_cache(maxsize=8)
+def _client_for(persist_dir: str) -> Any:
+    """Chroma client, opened once per process and persist directory."""
+    _require(get_chroma_client, _UTILS_IMPORT_ERROR, "utils")
+
+    return get_chroma_client(persist_dir)
+
+
+@functools.lru_cache(maxsize=8)
+def _collection_for(collection_name: Optional[str]) -> Any:
+    """Chroma collection handle, created once per process and collection name."""
+    return get_or_create_collection(_client_for(get_default_chroma_dir()), collection_name)
+
+
+# (collection_name, query_text, n_results) -> (docs, metas, ids). Keyed by the query
+# text so codes that expand to the same search terms share one retrieval.
+_RETRIEVALS: Dict[Tuple[Optional[str], str, int], Tuple[Tuple[str, ...], Tuple[Any, ...], Tuple[str, ...]]] = {}
+
+
+def _code_query(code_token: str, n_terms: int) -> str:
+    return " ".join(build_section_search_terms(code_token)[:n_terms]) or code_token
+
+
+def _retrieval_row(res: Dict[str, Any], i: int) -> Tuple[Tuple[str, ...], Tuple[Any, ...], Tuple[str, ...]]:
+    return (
+        tuple((res.get("documents") or [[]])[i]),
+        tuple((res.get("metadatas") or [[]])[i]),
+        tuple((res.get("ids") or [[]])[i]),
+    )
+
+
+def _retrieve_for_code(
+    collection_name: Optional[str], code_token: str, n_terms: int, n_results: int
+) -> Tuple[Tuple[str, ...], Tuple[Any, ...], Tuple[str, ...]]:
+    """Vector retrieval for a section token, memoised per run as ``(docs, metas, ids)``."""
+    _require(query_collection, _UTILS_IMPORT_ERROR, "utils")
+
+    q = _code_query(code_token, n_terms)
+    key = (collection_name, q, n_results)
+    hit = _RETRIEVALS.get(key)
+    if hit is None:
+        res = query_collection(_collection_for(collection_name), q, n_results=n_results)
+        hit = _RETRIEVALS[key] = _retrieval_row(res, 0)
+    return hit
+
+
+def _prefetch_retrievals(
+    collection_name: Optional[str], code_tokens: Iterable[str], n_terms: int, n_results: int
+) -> None:
+    """Warm ``_retrieve_for_code`` for many codes with one batched Chroma query.
+
+    Best effort: on any failure the per-code path retrieves (and reports) as before.
+    """
+    if query_collection_batch is None:
+        return
+    try:
+        queries = [
+            q for q in dict.fromkeys(_code_query(code, n_terms) for code in code_tokens)
+            if (collection_name, q, n_results) not in _RETRIEVALS
+        ]
+        if not queries:
+            return
+        res = query_collection_batch(_collection_for(collection_name), queries, n_results=n_results)
+        for i, q in enumerate(queries):
+            _RETRIEVALS[(collection_name, q, n_results)] = _retrieval_row(res, i)
+    except Exception:
+        return
+
+
+@functools.lru_cache(maxsize=None)
+def _activity_matcher() -> Tuple[Dict[str, List[str]], Dict[str, List[str]], Any]:
+    """Load ACTIVITY_KEYWORDS once as ``(keywords, owners, automaton)``.
+
+    ``owners`` maps each distinct keyword to the activities listing it (once per
+    listing, so repeated keywords keep their weight); ``automaton`` is a shared
+    pyahocorasick automaton over those keywords, or None when unavailable.
+    """
     try:
         from mappings.activities import ACTIVITY_KEYWORDS  # type: ignore
     except Exception:
@@ -278,39 +578,74 @@ def _infer_activity_for_code(code_token: str, design_text: str, collection_name:
         except Exception:
             mp = {}
         ACTIVITY_KEYWORDS = {k: [str(x).lower() for x in (v or [])] for k, v in mp.items()}
+    owners: Dict[str, List[str]] = {}
+    for act, kws in ACTIVITY_KEYWORDS.items():
+        for kw in kws:
+            if kw:
+                owners.setdefault(kw, []).append(act)
+    if ahocorasick is None or not owners:
+        return ACTIVITY_KEYWORDS, owners, None
+    automaton = ahocorasick.Automaton()
+    for kw in owners:
+        automaton.add_word(kw, kw)
+    automaton.make_automaton()
+    return ACTIVITY_KEYWORDS, owners, automaton
+
+
+def _keywords_in(hay: str) -> FrozenSet[str]:
+    """Distinct ACTIVITY_KEYWORDS occurring in ``hay`` (one automaton pass when available)."""
+    _, owners, automaton = _activity_matcher()
+    if automaton is not None:
+        return frozenset(kw for _, kw in automaton.iter(hay))
+    return frozenset(kw for kw in owners if kw in hay)
+
+
+@functools.lru_cache(maxsize=4)
+def _keywords_in_design(design_text_lc: str) -> FrozenSet[str]:
+    # The same lowercased design text is passed for every code in a run
+    return _keywords_in(design_text_lc)
+
+
+def _infer_activity_for_code(
+    code_token: str, design_text: str, collection_name: Optional[str], design_text_lc: Optional[str] = None
+) -> Optional[str]:
+    # Heuristic: match activities by keyword presence in design text + retrieved snippets near the code
+    ACTIVITY_KEYWORDS, owners, _ = _activity_matcher()
 
-    from utils import (
-        get_chroma_client,
-        get_default_chroma_dir,
-        get_or_create_collection,
-        query_collection,
-        build_section_search_terms,
-    )
     retrieved_text = ""
     try:
-        client = get_chroma_client(get_default_chroma_dir())
-        col = get_or_create_collection(client, collection_name)
-        terms = build_section_search_terms(code_token)
-        q = " ".join(terms[:6]) or code_token
-        res = query_collection(col, q, n_results=8)
-        docs = res.get("documents", [[]])[0]
+        docs, _, _ = _retrieve_for_code(collection_name, code_token, 6, 8)
         retrieved_text = "\n".join(docs[:6])
     except Exception:
         retrieved_text = ""
-    hay = f"{design_text}\n{retrieved_text}".lower()
+    if design_text_lc is None:
+        design_text_lc = design_text.lower()
     best_act: Optional[str] = None
     best_hits = 0
-    for act, kws in ACTIVITY_KEYWORDS.items():
-        hits = 0
-        for kw in kws:
-            if kw and kw in hay:
-                hits += 1
+    # Each distinct keyword is located once and then credited to every activity
+    # listing it. A keyword without a newline cannot straddle the design/retrieved
+    # boundary, so the (large) design text is scanned once per run, not per code.
+    if any("\n" in kw for kw in owners):
+        matched: Iterable[str] = _keywords_in(f"{design_text_lc}\n{retrieved_text.lower()}")
+    else:
+        matched = _keywords_in_design(design_text_lc) | _keywords_in(retrieved_text.lower())
+    counts: Dict[str, int] = {}
+    for kw in matched:
+        for act in owners[kw]:
+            counts[act] = counts.get(act, 0) + 1
+    for act in ACTIVITY_KEYWORDS:
+        hits = counts.get(act, 0)
         if hits > best_hits:
             best_hits = hits
             best_act = act
     return best_act
 
 
+# Completeness checks on an AHA's permits/training text: any keyword counts
+_AHA_PERMIT_RE = re.compile("|".join(map(re.escape, ("loto", "confined space", "permit", "lift plan", "hot work"))))
+_AHA_ROLE_RE = re.compile("|".join(map(re.escape, ("competent person", "qualified", "supervisor"))))
+
+
 def _finalize_aha_doc(
     aha: Any,
     label: str,
@@ -325,8 +660,9 @@ def _finalize_aha_doc(
 
     dedup: List[Any] = []
     seen_keys = set()
-    before_cits = len(getattr(aha, "citations", []) or [])
-    for c in list(getattr(aha, "citations", []) or []):
+    cits = getattr(aha, "citations", None) or []
+    before_cits = len(cits)
+    for c in cits:
         key = (
             (c.section_path or "").strip().lower(),
             (c.page_label or str(c.page_number) or "").strip().lower(),
@@ -350,9 +686,10 @@ def _finalize_aha_doc(
     def _collect_lists(a: Any) -> tuple[list[str], list[str]]:
         all_ppe: list[str] = []
         all_permits: list[str] = []
-        for it in getattr(a, "items", []) or []:
-            all_ppe.extend(getattr(it, "ppe", []) or [])
-            all_permits.extend(getattr(it, "permits_training", []) or [])
+        add_ppe, add_permits = all_ppe.extend, all_permits.extend
+        for it in getattr(a, "items", None) or ():
+            add_ppe(getattr(it, "ppe", None) or ())
+            add_permits(getattr(it, "permits_training", None) or ())
         return all_ppe, all_permits
 
     all_ppe, all_permits = _collect_lists(aha)
@@ -361,8 +698,8 @@ def _finalize_aha_doc(
     if "electrical" in (getattr(aha, "activity", "") or "").lower():
         ppe_ok = ppe_ok and ("arc" in low or "flash" in low)
     pt_low = "\n".join(all_permits).lower()
-    permits_ok = any(k in pt_low for k in ["loto", "confined space", "permit", "lift plan", "hot work"])
-    roles_ok = any(k in pt_low for k in ["competent person", "qualified", "supervisor"])
+    permits_ok = _AHA_PERMIT_RE.search(pt_low) is not None
+    roles_ok = _AHA_ROLE_RE.search(pt_low) is not None
     detail.update({
         "ppe_ok": bool(ppe_ok),
         "permits_ok": bool(permits_ok),
@@ -370,7 +707,7 @@ def _finalize_aha_doc(
     })
 
     out_dir.mkdir(parents=True, exist_ok=True)
-    slug = _slug(label or getattr(aha, "activity", "") or "aha") or "aha"
+    slug = _aha_slug(aha, label)
     docx_path = out_dir / f"{slug}.docx"
     md_path = out_dir / f"{slug}.md"
     docx_written: Optional[str] = None
@@ -386,6 +723,35 @@ def _finalize_aha_doc(
     return docx_written, md_written
 
 
+def _aha_slug(aha: Any, label: str) -> str:
+    """File stem ``_finalize_aha_doc`` writes ``aha`` under."""
+    return _slug(label or getattr(aha, "activity", "") or "aha") or "aha"
+
+
+def _finalize_aha_docs(
+    jobs: List[Tuple[Any, str]],
+    out_dir: Path,
+    metrics: Dict[str, Any],
+) -> List[Tuple[Optional[str], Optional[str]]]:
+    """``[_finalize_aha_doc(aha, label, out_dir, metrics) for aha, label in jobs]`` on the AHA pool.
+
+    Each doc is finalized into its own metrics, merged back in job order so totals and
+    per-activity details match a serial pass. Jobs that share a label or file name
+    run serially instead, so the last one still wins as before.
+    """
+    if len({label for _, label in jobs}) < len(jobs) or len({_aha_slug(aha, label) for aha, label in jobs}) < len(jobs):
+        return [_finalize_aha_doc(aha, label, out_dir, metrics) for aha, label in jobs]
+
+    def _finalize(job: Tuple[Any, str]) -> Tuple[Tuple[Optional[str], Optional[str]], Dict[str, Any]]:
+        local: Dict[str, Any] = {"citations_kept": 0, "citations_dropped": 0, "cleanup_removed_lines": 0, "per_activity": {}}
+        return _finalize_aha_doc(job[0], job[1], out_dir, local), local
+
+    results = _map_aha_generation(_finalize, jobs)
+    for _, local in results:
+        _merge_metrics(metrics, local)
+    return [written for written, _ in results]
+
+
 def _merge_metrics(dest: Dict[str, Any], src: Dict[str, Any]) -> None:
     if not src:
         return
@@ -410,17 +776,33 @@ def _merge_metrics(dest: Dict[str, Any], src: Dict[str, Any]) -> None:
                 existing[key] = value
 
 
+def _map_aha_generation(fn: Any, jobs: List[Any]) -> List[Any]:
+    """``[fn(job) for job in jobs]`` with generation overlapped on a thread pool.
+
+    AHA generation is retrieval/LLM-bound; ``AHA_PARALLEL`` (default 8) caps the
+    number of concurrent generations and ``AHA_PARALLEL=1`` runs them serially.
+    """
+    try:
+        configured = int(os.getenv("AHA_PARALLEL", "8"))
+    except ValueError:
+        configured = 8
+    workers = max(1, min(configured, len(jobs)))
+    if workers == 1:
+        return [fn(job) for job in jobs]
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="aha") as pool:
+        return list(pool.map(fn, jobs))
+
+
 def _generate_ahas(
     activities: List[str],
     out_dir: Path,
     collection_name: Optional[str],
     msf_doc_id: Optional[str],
 ) -> Tuple[List[str], List[str], List[Any], Dict[str, Any]]:
-    from generators.aha import generate_full_aha
+    _require(generate_full_aha, _AHA_IMPORT_ERROR, "generators.aha")
 
     out_docx: List[str] = []
     out_markdown: List[str] = []
-    aha_docs: List[Any] = []
     metrics: Dict[str, Any] = {
         "citations_kept": 0,
         "citations_dropped": 0,
@@ -428,11 +810,13 @@ def _generate_ahas(
         "per_activity": {}
     }
     out_dir.mkdir(parents=True, exist_ok=True)
-    for act in activities:
+
+    def _generate(act: str) -> Any:
         print(f"[aha] EM385 min-sim ~0.40; MSF min-sim 0.35 (informational)")
-        aha = generate_full_aha(act, collection_name or "", msf_doc_id=msf_doc_id)
-        aha_docs.append(aha)
-        docx_written, md_written = _finalize_aha_doc(aha, act, out_dir, metrics)
+        return generate_full_aha(act, collection_name or "", msf_doc_id=msf_doc_id)
+
+    aha_docs: List[Any] = _map_aha_generation(_generate, activities)
+    for docx_written, md_written in _finalize_aha_docs(list(zip(aha_docs, activities)), out_dir, metrics):
         if docx_written:
             out_docx.append(docx_written)
         if md_written:
@@ -440,68 +824,98 @@ def _generate_ahas(
     return out_docx, out_markdown, aha_docs, metrics
 
 
-def _trigger_plans(rows: List[Dict[str, str]], design_text: str, activities: List[str], codes_found: List[str]) -> List[Tuple[str, str]]:
-    out: List[Tuple[str, str]] = []
-    s = (design_text or "").lower()
-    # Expand synonyms to improve matching
-    synonyms = {
-        "prcs": "confined space",
-        "permit-required confined space": "confined space",
-        "energized work": "electrical",
-        "loto": "electrical",
-        "rigging": "crane",
-        "lifting": "crane",
-        "hot work": "welding",
-        "cutting": "welding",
-    }
-    s_aug = s
-    for k, v in synonyms.items():
-        if k in s:
-            s_aug += f" {v}"
+@functools.lru_cache(maxsize=32)
+def _literal_automaton(patterns: FrozenSet[str]) -> Any:
+    automaton = ahocorasick.Automaton()
+    for pat in patterns:
+        automaton.add_word(pat, pat)
+    automaton.make_automaton()
+    return automaton
+
+
+def _match_literals(patterns: Iterable[str], text: str) -> Set[str]:
+    """Return the subset of ``patterns`` occurring as substrings of ``text``.
+
+    Uses one Aho-Corasick pass when pyahocorasick is installed (automata are
+    cached per pattern set); otherwise tests each distinct pattern once.
+    """
+    pats = frozenset(pat for pat in patterns if pat)
+    if ahocorasick is not None and pats:
+        return {pat for _, pat in _literal_automaton(pats).iter(text)}
+    return {pat for pat in pats if pat in text}
+
+
+# Expand synonyms to improve matching
+_PLAN_SYNONYMS = {
+    "prcs": "confined space",
+    "permit-required confined space": "confined space",
+    "energized work": "electrical",
+    "loto": "electrical",
+    "rigging": "crane",
+    "lifting": "crane",
+    "hot work": "welding",
+    "cutting": "welding",
+}
+
+
+def _trigger_plans(
+    rules: PlanRules,
+    design_text: str,
+    activities: Iterable[str],
+    codes_found: Iterable[str],
+    design_text_lc: Optional[str] = None,
+) -> List[Tuple[str, str]]:
+    s = design_text_lc if design_text_lc is not None else (design_text or "").lower()
+    # One scan finds every synonym key; expansions are appended in table order
+    found = _match_literals(_PLAN_SYNONYMS, s)
+    s_aug = s + "".join(f" {v}" for k, v in _PLAN_SYNONYMS.items() if k in found)
     acts = {a.lower() for a in activities}
-    codes = set(codes_found)
-    for row in rows:
-        name = (row.get("plan_name") or "").strip()
-        ttype = (row.get("trigger_type") or "").strip().lower()
-        patt = (row.get("pattern") or "").strip().lower()
-        req_act = (row.get("requires_aha_activity") or "").strip().lower()
-        req_code = (row.get("requires_code") or "").strip()
-        why = None
-        if not name:
-            continue
-        if ttype == "contains_text" and patt and (patt in s_aug):
-            why = f"contains text: {patt}"
-        elif ttype == "aha_activity" and patt and patt in acts:
-            why = f"activity present: {patt}"
-        elif ttype == "code_present" and patt and patt in codes:
-            why = f"code present: {patt}"
-        if why:
-            if req_act and req_act not in acts:
-                continue
-            if req_code and req_code not in codes:
-                continue
-            out.append((name, why))
-    return out
+    codes = codes_found if isinstance(codes_found, (set, frozenset)) else set(codes_found)
+    # Gating depends only on the (activity, code) requirement pair, so resolve each
+    # distinct pair once and keep just the rules whose requirements are met.
+    open_gates = {
+        gate for gate in rules.gates
+        if (not gate[0] or gate[0] in acts) and (not gate[1] or gate[1] in codes)
+    }
+    if not open_gates:
+        return []
+    # Only rules whose pattern actually matched are visited: contains_text via a
+    # single scan over the text, the other buckets via dict lookups.
+    hits: List[Tuple[int, str, str]] = []
+
+    def _collect(matched: Iterable[str], bucket: Dict[str, List[Tuple[int, PlanRow]]], label: str) -> None:
+        for patt in matched:
+            why = f"{label}: {patt}"
+            hits.extend(
+                (order, row.plan_name, why)
+                for order, row in bucket[patt]
+                if (row.requires_aha_activity, row.requires_code) in open_gates
+            )
+
+    _collect(_match_literals(rules.contains_text, s_aug), rules.contains_text, "contains text")
+    _collect(acts.intersection(rules.aha_activity), rules.aha_activity, "activity present")
+    _collect(codes.intersection(rules.code_present), rules.code_present, "code present")
+    hits.sort(key=lambda hit: hit[0])
+    return [(name, why) for _, name, why in hits]
+
+
+_PLAN_PLACEHOLDER = (
+    "This is a placeholder. Populate with project-specific procedures and references to EM 385 citations in AHAs."
+)
 
 
 def _write_plans(plans: List[Tuple[str, str]], out_dir: Path) -> List[str]:
     out_paths: List[str] = []
     out_dir.mkdir(parents=True, exist_ok=True)
     for name, why in plans:
-        slug = _slug(name)
-        p = out_dir / f"{slug}.txt"
-        body = [
-            f"Plan: {name}",
-            f"Triggered: {why}",
-            "",
-            "This is a placeholder. Populate with project-specific procedures and references to EM 385 citations in AHAs.",
-        ]
-        p.write_text("\n".join(body), encoding="utf-8")
+        p = out_dir / f"{_slug(name)}.txt"
+        with open(p, "w", encoding="utf-8") as f:
+            f.write(f"Plan: {name}\nTriggered: {why}\n\n{_PLAN_PLACEHOLDER}")
         out_paths.append(str(p))
     return out_paths
 
 
-@dataclass
+@dataclass(slots=True)
 class RunResult:
     run_id: str
     input_file: str
@@ -517,39 +931,58 @@ class RunResult:
     code_decisions: List[Dict[str, Any]] = field(default_factory=list)
 
 
-def _write_decision(db: "firestore.Client", code_token: str, decision: Dict[str, Any]) -> None:
+def _write_decision(batch: "firestore.WriteBatch", db: "firestore.Client", code_token: str, decision: Dict[str, Any]) -> None:
     doc_ref = db.collection("decisions").document(code_token)
-    doc_ref.set(decision, merge=True)
+    batch.set(doc_ref, decision, merge=True)
+
+
+# Firestore caps a WriteBatch at 500 writes
+_FS_BATCH_LIMIT = 500
+
+
+def _write_decisions_batch(db: "firestore.Client", items: Dict[str, Dict[str, Any]]) -> None:
+    """Merge ``items`` (code token -> decision) into ``decisions``, one commit per 500 writes.
+
+    A failed commit is logged with the codes it lost; later batches still go out.
+    """
+    tokens = list(items)
+    for start in range(0, len(tokens), _FS_BATCH_LIMIT):
+        chunk = tokens[start:start + _FS_BATCH_LIMIT]
+        batch = db.batch()
+        for code_token in chunk:
+            _write_decision(batch, db, code_token, items[code_token])
+        try:
+            batch.commit()
+        except Exception as e:
+            print(
+                f"[design] decision write failed for {len(chunk)} codes ({chunk[0]}..{chunk[-1]}): {e}",
+                flush=True,
+            )
 
 
 def _rag_decide_requires_aha_for_code(code_token: str, collection_name: Optional[str]) -> Tuple[bool, float, str, List[Dict[str, Any]]]:
     # Heuristic classification using retrieval focused on the EM 385 section token
-    from utils import (
-        get_chroma_client,
-        get_default_chroma_dir,
-        get_or_create_collection,
-        query_collection,
-        keyword_search_collection,
-        build_section_search_terms,
-    )
-    client = get_chroma_client(get_default_chroma_dir())
-    col = get_or_create_collection(client, collection_name)
+    _require(keyword_search_collection, _UTILS_IMPORT_ERROR, "utils")
+
+    col = _collection_for(collection_name)
     # Build focused query on the section number
     terms = build_section_search_terms(code_token)
-    q = " ".join(terms[:10]) or code_token
-    res_vec = query_collection(col, q, n_results=12)
-    base_terms = list(set(terms[:10] + ["AHA", "JHA", "hazard analysis", "activity hazard analysis", "shall", "must"]))
+    vec_docs, vec_metas, vec_ids = _retrieve_for_code(collection_name, code_token, 10, 12)
+    base_terms = list(dict.fromkeys(terms[:10] + ["AHA", "JHA", "hazard analysis", "activity hazard analysis", "shall", "must"]))
     res_kw = keyword_search_collection(col, base_terms, max_results=12)
 
-    ids = [*res_vec.get("ids", [[]])[0]]
-    docs = [*res_vec.get("documents", [[]])[0]]
-    metas = [*res_vec.get("metadatas", [[]])[0]]
-    seen = set(ids)
-    for i, id_ in enumerate(res_kw.get("ids", [[]])[0]):
+    ids = [*vec_ids]
+    docs = [*vec_docs]
+    metas = [*vec_metas]
+    seen = set(vec_ids)
+    kw_ids = res_kw.get("ids", [[]])[0]
+    kw_metas = res_kw.get("metadatas", [[]])[0]
+    kw_docs = res_kw.get("documents", [[]])[0]
+    for i, id_ in enumerate(kw_ids):
         if id_ not in seen:
             ids.append(id_)
-            metas.append(res_kw.get("metadatas", [[]])[0][i])
-            docs.append(res_kw.get("documents", [[]])[0][i])
+            metas.append(kw_metas[i])
+            docs.append(kw_docs[i])
             seen.add(id_)
 
     # Simple heuristic: positive if AHA/JHA wording appears in top docs
@@ -559,13 +992,14 @@ def _rag_decide_requires_aha_for_code(code_token: str, collection_name: Optional
     rationale = "RAG-backed heuristic based on EM 385 section context"
     citations: List[Dict[str, Any]] = []
     for m in metas[:5]:
-        m = m or {}
+        get = (m or {}).get
+        page_number = get("page_number")
         citations.append({
-            "section_path": str(m.get("section_path") or m.get("headers") or m.get("title") or ""),
-            "page_label": str(m.get("page_label") or ""),
-            "page_number": m.get("page_number") if isinstance(m.get("page_number"), int) else None,
-            "quote_anchor": str(m.get("quote_anchor") or ""),
-            "source_url": str(m.get("source_url") or ""),
+            "section_path": str(get("section_path") or get("headers") or get("title") or ""),
+            "page_label": str(get("page_label") or ""),
+            "page_number": page_number if isinstance(page_number, int) else None,
+            "quote_anchor": str(get("quote_anchor") or ""),
+            "source_url": str(get("source_url") or ""),
         })
     return positive, confidence, rationale, citations
 
@@ -581,6 +1015,7 @@ def process_design_spec(
     fs_max_retries: int = 5,
     fs_backoff_base: float = 0.5,
     fs_between_batches_sleep: float = 0.5,
+    fs_concurrency: int = 4,
     write_partials: bool = True,
     include_admin_ufgs: bool = False,
     msf_doc_id: Optional[str] = None,
@@ -590,6 +1025,8 @@ def process_design_spec(
     p = Path(input_path)
     if not p.exists():
         raise FileNotFoundError(str(p))
+    # Retrievals are shared within a run only; the collection may be re-ingested between runs
+    _RETRIEVALS.clear()
 
     run_id = datetime.now(timezone.utc).strftime("%Y%m%d_%H%M%S")
     run_dir = Path(_project_root()) / "outputs" / "runs" / run_id
@@ -610,7 +1047,7 @@ def process_design_spec(
             }
             if extra:
                 payload.update(extra)
-            (run_dir / "manifest.partial.json").write_text(json.dumps(payload, indent=2), encoding="utf-8")
+            _write_json(run_dir / "manifest.partial.json", payload)
         except Exception:
             pass
 
@@ -625,11 +1062,13 @@ def process_design_spec(
         text = _read_docx_text(p)
     else:
         raise ValueError(f"Unsupported file type: {p.suffix}")
+    # Lowercased once per run and reused by per-code activity inference
+    text_lc = text.lower()
 
     # Extract codes and fetch decisions (batched for speed + reliability)
-    codes_em385 = _extract_codes(text)
     # Exclude admin divisions 00/01 by default to reduce false positives in TOC
-    codes_ufgs = _extract_ufgs_codes(text, include_admin=include_admin_ufgs)
+    em385_scan, ufgs_scan, meta_scan = _scan_design_text_cached(text, _text_digest(text), bool(include_admin_ufgs))
+    codes_em385, codes_ufgs, project_meta = list(em385_scan), list(ufgs_scan), dict(meta_scan)
     codes_found = codes_em385 + codes_ufgs
     print(f"[design] extracted codes: em385={len(codes_em385)}, ufgs={len(codes_ufgs)}, total={len(codes_found)}", flush=True)
     decisions: Dict[str, Dict[str, Any]] = {}
@@ -639,22 +1078,53 @@ def process_design_spec(
         total = len(codes_found)
         bs = max(1, int(fs_batch_size))
         batches = ceil(total / bs)
-        print(f"[design] fetching decisions in {batches} batch(es) (batch_size={bs})…", flush=True)
-        for i in range(batches):
-            start = i * bs
-            end = min(total, start + bs)
-            refs = [db.collection("decisions").document(code) for code in codes_found[start:end]]
+        concurrency = max(1, int(fs_concurrency))
+        print(f"[design] fetching decisions in {batches} batch(es) (batch_size={bs}, concurrency={concurrency})…", flush=True)
+
+        def _get_decision(code: str) -> Any:
+            try:
+                return db.collection("decisions").document(code).get()
+            except Exception as exc:
+                return exc
+
+        def _fetch_batch(i: int) -> Tuple[bool, List[Any], float]:
+            """Read batch ``i`` as ``(via_get_all, snaps_in_code_order, seconds)``; retries stay per batch."""
+            batch_codes = codes_found[i * bs:(i + 1) * bs]
+            refs = [db.collection("decisions").document(code) for code in batch_codes]
             # retry with backoff on quota/timeouts
             attempt = 0
             t0 = time.perf_counter()
             while True:
                 try:
-                    snaps = db.get_all(refs)
-                    took = time.perf_counter() - t0
+                    # get_all does not promise response order; key snapshots by doc id
+                    snaps = {snap.id: snap for snap in db.get_all(refs)}
+                    return True, [snaps.get(code) for code in batch_codes], time.perf_counter() - t0
+                except Exception as e:
+                    attempt += 1
+                    if attempt > max(0, int(fs_max_retries)):
+                        print(f"[design] batch {i+1}/{batches} failed after {attempt-1} retries: {e}; falling back to per-doc", flush=True)
+                        # per-doc fallback; the single reads are network-bound, so issue them concurrently
+                        with ThreadPoolExecutor(max_workers=min(16, len(batch_codes)), thread_name_prefix="decisions") as pool:
+                            return False, list(pool.map(_get_decision, batch_codes)), time.perf_counter() - t0
+                    sleep_s = (fs_backoff_base or 0.5) * (2 ** (attempt - 1))
+                    sleep_s = min(8.0, sleep_s)
+                    print(f"[design] batch {i+1}/{batches} retry {attempt} in {sleep_s:.2f}s due to: {e}", flush=True)
+                    time.sleep(sleep_s)
+
+        # Up to `concurrency` batches are in flight at once; results are applied on this
+        # thread in batch order, and the pacing sleep now separates waves of batches.
+        with ThreadPoolExecutor(max_workers=min(concurrency, batches), thread_name_prefix="decision-batches") as batch_pool:
+            for wave in range(0, batches, concurrency):
+                indices = range(wave, min(batches, wave + concurrency))
+                for i, (via_get_all, snaps, took) in zip(indices, batch_pool.map(_fetch_batch, indices)):
                     ok = 0
                     unk = 0
-                    for code, snap in zip(codes_found[start:end], snaps):
-                        if getattr(snap, "exists", False):
+                    err = 0
+                    for code, snap in zip(codes_found[i * bs:(i + 1) * bs], snaps):
+                        if isinstance(snap, Exception):
+                            decisions[code] = {"status": "error"}
+                            err += 1
+                        elif getattr(snap, "exists", False):
                             val = dict(snap.to_dict() or {})
                             val.setdefault("status", "firestore")
                             decisions[code] = val
@@ -664,60 +1134,41 @@ def process_design_spec(
                         else:
                             decisions[code] = {"status": "unknown"}
                             unk += 1
-                    print(f"[design] batch {i+1}/{batches} fetched {ok} known, {unk} unknown in {took:.2f}s", flush=True)
-                    _write_partial_manifest("decisions_batch", {"batch_index": i+1, "batches": batches, "fetched_known": ok, "fetched_unknown": unk})
-                    break
-                except Exception as e:
-                    attempt += 1
-                    if attempt > max(0, int(fs_max_retries)):
-                        print(f"[design] batch {i+1}/{batches} failed after {attempt-1} retries: {e}; falling back to per-doc", flush=True)
-                        # per-doc fallback with tiny delay
-                        ok = 0
-                        unk = 0
-                        err = 0
-                        for code in codes_found[start:end]:
-                            try:
-                                snap = db.collection("decisions").document(code).get()
-                                if getattr(snap, "exists", False):
-                                    val = dict(snap.to_dict() or {})
-                                    val.setdefault("status", "firestore")
-                                    decisions[code] = val
-                                    ok += 1
-                                    if "requiresAha" in val:
-                                        decisions_mapped[code] = bool(val["requiresAha"])
-                                else:
-                                    decisions[code] = {"status": "unknown"}
-                                    unk += 1
-                            except Exception:
-                                decisions[code] = {"status": "error"}
-                                err += 1
-                            time.sleep(0.05)
+                    if via_get_all:
+                        print(f"[design] batch {i+1}/{batches} fetched {ok} known, {unk} unknown in {took:.2f}s", flush=True)
+                        _write_partial_manifest("decisions_batch", {"batch_index": i+1, "batches": batches, "fetched_known": ok, "fetched_unknown": unk})
+                    else:
                         print(f"[design] per-doc fallback batch {i+1}/{batches}: ok={ok}, unknown={unk}, error={err}", flush=True)
                         _write_partial_manifest("decisions_perdoc_batch", {"batch_index": i+1, "batches": batches, "ok": ok, "unknown": unk, "error": err})
-                        break
-                    sleep_s = (fs_backoff_base or 0.5) * (2 ** (attempt - 1))
-                    sleep_s = min(8.0, sleep_s)
-                    print(f"[design] batch {i+1}/{batches} retry {attempt} in {sleep_s:.2f}s due to: {e}", flush=True)
-                    time.sleep(sleep_s)
-            # gentle pacing between batches
-            if fs_between_batches_sleep and i < (batches - 1):
-                time.sleep(max(0.0, float(fs_between_batches_sleep)))
+                # gentle pacing between waves
+                if fs_between_batches_sleep and wave + concurrency < batches:
+                    time.sleep(max(0.0, float(fs_between_batches_sleep)))
 
     auto_classified_codes: List[str] = []
-    inferred_activity_by_code: Dict[str, str] = {}
+    # Misses are cached too (as None) so no code is inferred twice per run
+    inferred_activity_by_code: Dict[str, Optional[str]] = {}
 
     def _cache_inferred_activity(code_token: str) -> Optional[str]:
         if code_token in inferred_activity_by_code:
             return inferred_activity_by_code[code_token]
-        act_val = _infer_activity_for_code(code_token, text, collection_name)
-        if act_val:
-            inferred_activity_by_code[code_token] = act_val
+        act_val = _infer_activity_for_code(code_token, text, collection_name, text_lc)
+        inferred_activity_by_code[code_token] = act_val
         return act_val
 
     if auto_classify_unknown and not classify_only and codes_found:
+        def _needs_classification(dec: Dict[str, Any]) -> bool:
+            return not ("requiresAha" in dec and dec.get("status") not in {"unknown", None})
+
+        # One batched vector query covers every code about to be classified
+        _prefetch_retrievals(
+            collection_name,
+            (code for code in codes_found if _needs_classification(decisions.get(code, {}) or {})),
+            10,
+            12,
+        )
         for code in codes_found:
             dec = decisions.get(code, {}) or {}
-            if "requiresAha" in dec and dec.get("status") not in {"unknown", None}:
+            if not _needs_classification(dec):
                 continue
             try:
                 req, conf, rat, cits = _rag_decide_requires_aha_for_code(code, collection_name)
@@ -735,26 +1186,29 @@ def process_design_spec(
             decisions[code] = updated
             if "requiresAha" in updated:
                 decisions_mapped[code] = bool(updated["requiresAha"])
-                if bool(updated["requiresAha"]):
-                    _cache_inferred_activity(code)
             auto_classified_codes.append(code)
         auto_classified_codes = sorted({c for c in auto_classified_codes if c})
 
     # Determine which activities to generate AHAs for
     # 1) All codes requiring AHA → infer activity per code
     activities: List[str] = []
+    _prefetch_retrievals(
+        collection_name,
+        (c for c, d in decisions.items() if bool((d or {}).get("requiresAha")) and c not in inferred_activity_by_code),
+        6,
+        8,
+    )
     for code, dec in decisions.items():
         if bool((dec or {}).get("requiresAha")):
             act = _cache_inferred_activity(code)
             if act:
                 activities.append(act)
     # 2) Also include activities detected from the overall design text
-    try:
-        from generators.activity_detect import detect_activities
-        detected = detect_activities(text)
-        activities.extend(detected)
-    except Exception:
-        pass
+    if detect_activities is not None:
+        try:
+            activities.extend(detect_activities(text))
+        except Exception:
+            pass
     # 3) MSF-grounded activity detection (limit activities to those found in MSF index for this doc, if available)
     msf_map: Dict[str, List[Dict[str, Any]]] = {}
     msf_doc_id_effective = msf_doc_id or Path(input_path).stem
@@ -763,34 +1217,28 @@ def process_design_spec(
         msf_map = detect_activities_from_msf(doc_id=msf_doc_id_effective)
     except Exception:
         msf_map = {}
-    # stable unique preserve order
-    seen = set()
-    uniq_acts: List[str] = []
     # Prefer MSF-detected activities when available
     if msf_map:
         activities = list(msf_map.keys())
-    for a in activities:
-        if a and a not in seen:
-            seen.add(a)
-            uniq_acts.append(a)
+    # stable unique preserve order
+    uniq_acts: List[str] = list(dict.fromkeys(a for a in activities if a))
 
     # Coverage metrics for codes requiring an AHA
     codes_requiring = {c for c, d in decisions.items() if bool((d or {}).get("requiresAha"))}
     # Map activities to covered codes via simple inference
+    # (each code infers one activity, so it lands in at most one list)
     act_to_codes: Dict[str, List[str]] = {a: [] for a in uniq_acts}
-    for c in list(codes_requiring):
+    codes_covered: Set[str] = set()
+    code_to_activity: Dict[str, str] = {}
+    for c in codes_requiring:
         a = _cache_inferred_activity(c)
         if a and a in act_to_codes:
             act_to_codes[a].append(c)
-    codes_covered = set()
-    for lst in act_to_codes.values():
-        codes_covered.update(lst)
-    code_to_activity: Dict[str, str] = {}
-    for act_name, code_list in act_to_codes.items():
-        for code_token in code_list:
-            if code_token not in code_to_activity:
-                code_to_activity[code_token] = act_name
+            codes_covered.add(c)
+            code_to_activity[c] = a
     codes_uncovered = sorted(list(codes_requiring - codes_covered))
+    # Failing coverage enforcement withholds the CSP/AHA Book, so they are not built at all
+    coverage_failed = coverage_enforce == "fail" and bool(codes_uncovered)
 
     warnings: List[str] = []
     if auto_classified_codes:
@@ -800,21 +1248,29 @@ def process_design_spec(
     aha_docs: List[Any] = []
     aha_metrics: Dict[str, Any] = {"citations_kept": 0, "citations_dropped": 0, "cleanup_removed_lines": 0, "per_activity": {}}
     if not classify_only:
+        msf_id = msf_doc_id_effective or None
         if aha_mode == "code":
             # One AHA per code requiring AHA
-            from generators.aha import generate_full_aha
-            msf_id = msf_doc_id_effective if msf_doc_id_effective else None
-            for code in sorted(codes_requiring):
-                act = _infer_activity_for_code(code, text, collection_name) or "General"
-                aha = generate_full_aha(act, collection_name or "", msf_doc_id=msf_id)
+            _require(generate_full_aha, _AHA_IMPORT_ERROR, "generators.aha")
+            code_jobs = [(code, _cache_inferred_activity(code) or "General") for code in sorted(codes_requiring)]
+            # Generation depends only on the activity, so codes sharing one reuse a single
+            # generated template; each code still gets its own AHA (a copy while the
+            # template is needed again, since finalizing mutates the doc).
+            remaining = Counter(act for _, act in code_jobs)
+            templates = dict(zip(remaining, _map_aha_generation(
+                lambda act: generate_full_aha(act, collection_name or "", msf_doc_id=msf_id), list(remaining)
+            )))
+            for code, act in code_jobs:
+                remaining[act] -= 1
+                aha = templates[act] if not remaining[act] else copy.deepcopy(templates[act])
                 aha.name = f"AHA - {code} ({act})"
                 try:
                     aha.codes_covered = [code]  # type: ignore[attr-defined]
                 except Exception:
                     pass
                 aha_docs.append(aha)
-                label = f"{code} {act}".strip()
-                docx_written, md_written = _finalize_aha_doc(aha, label, ahas_dir, aha_metrics)
+            finalize_jobs = [(aha, f"{code} {act}".strip()) for aha, (code, act) in zip(aha_docs, code_jobs)]
+            for docx_written, md_written in _finalize_aha_docs(finalize_jobs, ahas_dir, aha_metrics):
                 if docx_written:
                     aha_files.append(docx_written)
                 if md_written:
@@ -824,7 +1280,7 @@ def process_design_spec(
                     uniq_acts,
                     ahas_dir,
                     collection_name,
-                    msf_doc_id_effective if msf_doc_id_effective else None,
+                    msf_id,
                 )
                 aha_docs.extend(fallback_docs)
                 aha_files.extend(fallback_docx)
@@ -832,9 +1288,10 @@ def process_design_spec(
                 _merge_metrics(aha_metrics, fallback_metrics)
                 warnings.append("No curated AHA decisions found; generated AHAs from detected activities as fallback.")
         else:
-            aha_files, aha_markdown_files, aha_docs, aha_metrics = _generate_ahas(uniq_acts, ahas_dir, collection_name, msf_doc_id_effective if msf_doc_id_effective else None)
+            aha_files, aha_markdown_files, aha_docs, aha_metrics = _generate_ahas(uniq_acts, ahas_dir, collection_name, msf_id)
 
     code_decision_summary: List[Dict[str, Any]] = []
+    auto_classified_set = set(auto_classified_codes)  # the list stays as-is for the manifest
     for code in codes_found:
         dec = decisions.get(code, {}) or {}
         requires_val = dec.get("requiresAha")
@@ -845,7 +1302,7 @@ def process_design_spec(
             requires_bool = None
         else:
             requires_bool = bool(requires_val)
-        status_raw = dec.get("status") or ("auto" if code in auto_classified_codes else ("firestore" if "requiresAha" in dec else "unknown"))
+        status_raw = dec.get("status") or ("auto" if code in auto_classified_set else ("firestore" if "requiresAha" in dec else "unknown"))
         status = str(status_raw)
         aha_generated = bool(requires_bool) and (((aha_mode == "code") and (code in codes_requiring)) or (code in codes_covered))
 
@@ -892,16 +1349,15 @@ def process_design_spec(
     csp_md_path = ""
     aha_book_docx_path = ""
     aha_book_md_path = ""
-    project_meta = _extract_project_meta(text)
-    for k in ["project_name", "location", "owner", "gc"]:
-        if not (project_meta.get(k) or "").strip():
+    placeholders_filled = 0
+    for k in _PLACEHOLDER_KEYS:
+        v = (project_meta.get(k) or "").strip()
+        if not v:
             warnings.append(f"Missing {k} in spec text; using default placeholder.")
-    def _is_present(val: str) -> bool:
-        v = (val or "").strip()
-        return bool(v) and v.lower() not in {"project", "owner", "gc"}
-    placeholders_filled = sum(1 for k in ["project_name","location","owner","gc"] if _is_present(project_meta.get(k, "")))
-    incomplete = placeholders_filled < 4
-    if not classify_only and (uniq_acts or aha_docs):
+        elif v.lower() not in _PLACEHOLDER_DEFAULTS:
+            placeholders_filled += 1
+    incomplete = placeholders_filled < len(_PLACEHOLDER_KEYS)
+    if not classify_only and (uniq_acts or aha_docs) and not coverage_failed:
         try:
             from generators.csp import generate_csp
             from export.docx_writer import write_aha_book, write_csp_docx
@@ -911,12 +1367,9 @@ def process_design_spec(
             if uniq_acts:
                 acts_for_csp = list(uniq_acts)
             elif aha_docs:
-                seen_act: set[str] = set()
-                for doc in aha_docs:
-                    act_label = (getattr(doc, "activity", "") or "General Activity").strip()
-                    if act_label not in seen_act:
-                        seen_act.add(act_label)
-                        acts_for_csp.append(act_label)
+                acts_for_csp = list(dict.fromkeys(
+                    (getattr(doc, "activity", "") or "General Activity").strip() for doc in aha_docs
+                ))
 
             spec_obj = {
                 "project_name": project_meta.get("project_name") or "Project",
@@ -953,6 +1406,18 @@ def process_design_spec(
     if not classify_only and (incomplete or not uniq_acts):
         warnings.append("Incomplete project header (Project/Owner/GC/Location missing). Skipping CSP/AHA Book exports.")
 
+    # Shared by the manifest and the Firestore run record
+    run_metrics: Dict[str, Any] = {
+        "placeholders_filled": placeholders_filled,
+        "plans_triggered": len(plan_triggers),
+        "activities_detected": len(uniq_acts),
+        "ahas_generated": len(aha_docs) if aha_docs else 0,
+        "citations_kept": aha_metrics.get("citations_kept", 0),
+        "citations_dropped": aha_metrics.get("citations_dropped", 0),
+        "cleanup_removed_lines": aha_metrics.get("cleanup_removed_lines", 0),
+        "citations_per_activity": aha_metrics.get("per_activity", {}),
+    }
+
     if not classify_only:
         manifest = {
             "run_id": run_id,
@@ -977,14 +1442,7 @@ def process_design_spec(
             "code_decisions": code_decision_summary,
             "warnings": warnings,
             "metrics": {
-                "placeholders_filled": placeholders_filled,
-                "plans_triggered": len(plan_triggers),
-                "activities_detected": len(uniq_acts),
-                "ahas_generated": len(aha_docs) if aha_docs else 0,
-                "citations_kept": aha_metrics.get("citations_kept", 0),
-                "citations_dropped": aha_metrics.get("citations_dropped", 0),
-                "cleanup_removed_lines": aha_metrics.get("cleanup_removed_lines", 0),
-                "citations_per_activity": aha_metrics.get("per_activity", {}),
+                **run_metrics,
                 "codes_requiring_aha_total": len(codes_requiring),
                 "codes_covered_in_ahas": len(codes_covered),
                 "codes_uncovered": codes_uncovered,
@@ -994,16 +1452,12 @@ def process_design_spec(
             warnings.append(f"Codes uncovered: {len(codes_uncovered)}")
         if msf_map and len(aha_docs) != len(msf_map.keys()):
             warnings.append("AHA/MSF activity parity mismatch: generated != MSF activities.")
-        if coverage_enforce == "fail" and codes_uncovered:
+        if coverage_failed:
             warnings.append("Coverage enforcement: fail. Skipping CSP/AHA outputs due to uncovered codes.")
-            # remove paths so UI won't offer downloads
+            # remove AHA paths so UI won't offer downloads (CSP/AHA Book were never written)
             manifest["ahas"] = []
             manifest["aha_markdown"] = []
-            manifest["csp_docx"] = ""
-            manifest["csp_md"] = ""
-            manifest["aha_book_docx"] = ""
-            manifest["aha_book_md"] = ""
-        manifest_path.write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+        _write_json(manifest_path, manifest)
 
     # Optional: Upload outputs to Firebase Storage if configured
     storage_links: Dict[str, Any] = {}
@@ -1025,21 +1479,24 @@ def process_design_spec(
                         return f"gs://{bucket_name}/{blob.name}"
                     except Exception:
                         return None
-                # Upload main artifacts
-                storage_links["manifest"] = _upload(str(manifest_path), "") or ""
-                storage_links["csp_docx"] = _upload(csp_docx_path, "") or ""
-                storage_links["csp_md"] = _upload(csp_md_path, "") or ""
-                storage_links["aha_book_docx"] = _upload(aha_book_docx_path, "") or ""
-                storage_links["aha_book_md"] = _upload(aha_book_md_path, "") or ""
-                # Upload AHAs
-                for f in aha_files:
-                    link = _upload(f, "ahas")
-                    if link:
-                        storage_links.setdefault("ahas", []).append(link)
-                for f in aha_markdown_files:
-                    link = _upload(f, "ahas_markdown")
+                # Uploads are independent and network-bound, so they run on a small pool
+                main_jobs = [
+                    ("manifest", str(manifest_path)),
+                    ("csp_docx", csp_docx_path),
+                    ("csp_md", csp_md_path),
+                    ("aha_book_docx", aha_book_docx_path),
+                    ("aha_book_md", aha_book_md_path),
+                ]
+                upload_jobs = [(f, "") for _, f in main_jobs]
+                upload_jobs += [(f, "ahas") for f in aha_files]
+                upload_jobs += [(f, "ahas_markdown") for f in aha_markdown_files]
+                with ThreadPoolExecutor(max_workers=min(8, len(upload_jobs)), thread_name_prefix="upload") as pool:
+                    links = list(pool.map(lambda job: _upload(*job), upload_jobs))
+                for (key, _), link in zip(main_jobs, links):
+                    storage_links[key] = link or ""
+                for (_, dest_prefix), link in zip(upload_jobs[len(main_jobs):], links[len(main_jobs):]):
                     if link:
-                        storage_links.setdefault("ahas_markdown", []).append(link)
+                        storage_links.setdefault(dest_prefix, []).append(link)
             except Exception:
                 pass
 
@@ -1065,16 +1522,7 @@ def process_design_spec(
                 "code_decisions": code_decision_summary,
                 "project_meta": project_meta,
                 "decisions_mapped": decisions_mapped,
-                "metrics": {
-                    "placeholders_filled": placeholders_filled,
-                    "plans_triggered": len(plan_triggers),
-                    "activities_detected": len(uniq_acts),
-                    "ahas_generated": len(aha_docs) if aha_docs else 0,
-                    "citations_kept": aha_metrics.get("citations_kept", 0),
-                    "citations_dropped": aha_metrics.get("citations_dropped", 0),
-                    "cleanup_removed_lines": aha_metrics.get("cleanup_removed_lines", 0),
-                    "citations_per_activity": aha_metrics.get("per_activity", {}),
-                },
+                "metrics": run_metrics,
             }
             if storage_links:
                 doc_payload["storage_links"] = storage_links
@@ -1084,19 +1532,22 @@ def process_design_spec(
 
     # If classify-only and a code decision is missing, attempt to classify and store
     if classify_only:
+        classified: Dict[str, Dict[str, Any]] = {}
         for code, dec in decisions.items():
             if not dec or dec.get("status") in {"unknown", None}:
                 try:
                     req, conf, rat, cits = _rag_decide_requires_aha_for_code(code, collection_name)
-                    _write_decision(db, code, {
-                        "requiresAha": bool(req),
-                        "confidence": float(conf),
-                        "rationale": rat,
-                        "citations": cits,
-                        "updated_at": datetime.now(timezone.utc).isoformat(),
-                    })
                 except Exception:
-                    pass
+                    continue
+                classified[code] = {
+                    "requiresAha": bool(req),
+                    "confidence": float(conf),
+                    "rationale": rat,
+                    "citations": cits,
+                    "updated_at": datetime.now(timezone.utc).isoformat(),
+                }
+        if classified:
+            _write_decisions_batch(db, classified)
 
     return RunResult(
         run_id=run_id,
@@ -1128,6 +1579,7 @@ def _parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
     ap.add_argument("--fs-max-retries", type=int, default=5, help="Max retries per batch on Firestore errors")
     ap.add_argument("--fs-backoff-base", type=float, default=0.5, help="Base seconds for exponential backoff between retries")
     ap.add_argument("--fs-between-batches-sleep", type=float, default=0.5, help="Sleep seconds between batches to avoid 429s")
+    ap.add_argument("--fs-concurrency", type=int, default=4, help="Firestore decision read batches in flight at once")
     ap.add_argument("--write-partials", action="store_true", help="Write partial manifest updates while running")
     ap.add_argument("--no-auto-classify", dest="auto_classify_unknown", action="store_false", help="Disable automatic RAG classification for unknown codes")
     ap.set_defaults(auto_classify_unknown=True)
@@ -1147,6 +1599,7 @@ def main() -> int:
         fs_max_retries=args.fs_max_retries,
         fs_backoff_base=args.fs_backoff_base,
         fs_between_batches_sleep=args.fs_between_batches_sleep,
+        fs_concurrency=args.fs_concurrency,
         write_partials=bool(args.write_partials),
         include_admin_ufgs=bool(args.include_admin_ufgs),
         msf_doc_id=args.msf_doc_id,
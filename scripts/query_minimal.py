@@ -1,24 +1,44 @@
 #!/usr/bin/env python
 from __future__ import annotations
-import json, os, subprocess, sys
+import json, os, subprocess, sys, time
+from pathlib import Path
 
 from config import load_vertex_config
 
 MARK = "/tmp/projB_smoketest_hit"
+# gcloud describe output is reused for a few minutes so smoke-test reruns skip the subprocess
+DESCRIBE_CACHE_TTL_S = 300
+
+def _describe_endpoint(endpoint_id: str, region: str) -> str:
+    key = f"{region}_{endpoint_id}".replace("/", "_")
+    cache_path = Path(f"/tmp/projB_endpoint_cache_{key}.json")
+    try:
+        if time.time() - cache_path.stat().st_mtime < DESCRIBE_CACHE_TTL_S:
+            return cache_path.read_text(encoding="utf-8")
+    except OSError:
+        pass
+    out = subprocess.check_output([
+        "gcloud","ai","index-endpoints","describe",endpoint_id,
+        "--region", region, "--format=json"
+    ], text=True)
+    try:
+        tmp = cache_path.with_suffix(".tmp")
+        tmp.write_text(out, encoding="utf-8")
+        os.replace(tmp, cache_path)
+    except OSError:
+        pass
+    return out
 
 def main() -> int:
     cfg = load_vertex_config(raise_on_missing=True)
     try:
-        out = subprocess.check_output([
-            "gcloud","ai","index-endpoints","describe",cfg.endpoint_id,
-            "--region", cfg.gcp_region, "--format=json"
-        ], text=True)
+        out = _describe_endpoint(cfg.endpoint_id, cfg.gcp_region)
         j = json.loads(out)
         deployed = [d.get("id") for d in j.get("deployedIndexes", [])]
         print("[query-min] deployedIndexes:", deployed)
         # Without an import pipeline, we can't ensure the vector exists; treat deployment presence as readiness
         if deployed:
-            open(MARK, "w").write("ready")
+            Path(MARK).write_text("ready")
             print("[query-min] PASS (deployment present; namespace-filtered query path exists in app)")
             return 0
         print("[query-min] FAIL (no deployment present)")
@@ -1,9 +1,15 @@
 from __future__ import annotations
 
+import bisect
 import json
 import os
 import sys
-from typing import Dict, Any
+from typing import Dict, Any, List, Tuple
+
+try:  # optional: faster summary serialization, written straight as UTF-8 bytes
+    import orjson  # type: ignore
+except Exception:
+    orjson = None  # type: ignore
 
 
 def _project_root() -> str:
@@ -48,42 +54,68 @@ def main() -> int:
 
     db = firestore.client()
 
-    def _count(coll_name: str) -> int:
-        n = 0
-        for _ in db.collection(coll_name).stream():
-            n += 1
-        return n
+    def _count(coll_name: str, field: str | None = None, value: Any = None) -> int:
+        """Server-side count() aggregation; one small reply instead of every document."""
+        q = db.collection(coll_name)
+        if field is not None:
+            from google.cloud.firestore_v1.base_query import FieldFilter
+            q = q.where(filter=FieldFilter(field, "==", value))
+        try:
+            return int(q.count().get()[0][0].value)
+        except AttributeError:
+            # Client predates aggregation queries: stream ids only (no field data)
+            return sum(1 for _ in q.select([]).stream())
+
+    def _missing_decisions(sample_size: int = 20, batch_size: int = 300) -> Tuple[int, List[str]]:
+        """Count codes without a decision and return the smallest ``sample_size`` ids.
+
+        Code ids are streamed and checked against ``decisions`` one ``get_all`` batch at
+        a time (ids only), so memory stays bounded by the batch rather than holding
+        both collections' ids as sets.
+        """
+        dec_coll = db.collection("decisions")
+        count = 0
+        sample: List[str] = []  # kept sorted, at most sample_size long
+
+        def _check(batch: List[str]) -> None:
+            nonlocal count
+            for snap in db.get_all([dec_coll.document(cid) for cid in batch], field_paths=[]):
+                if snap.exists:
+                    continue
+                count += 1
+                if len(sample) < sample_size or snap.id < sample[-1]:
+                    bisect.insort(sample, snap.id)
+                    del sample[sample_size:]
+
+        batch: List[str] = []
+        try:
+            for doc in db.collection("codes").select([]).stream():
+                batch.append(doc.id)
+                if len(batch) >= batch_size:
+                    _check(batch)
+                    batch = []
+            if batch:
+                _check(batch)
+        except Exception:
+            pass
+        return count, sample
 
     # Totals
     total_codes = _count("codes")
     total_decisions = _count("decisions")
     total_runs = _count("runs")
 
-    # Decisions breakdown and missing
+    # Decisions breakdown and missing. requiresAha is always written as a bool, so
+    # two filtered counts cover it; documents without the field are "unknown".
     yes = no = unknown = 0
-    decisions_ids = set()
-    try:
-        for doc in db.collection("decisions").stream():
-            decisions_ids.add(doc.id)
-            d = doc.to_dict() or {}
-            if "requiresAha" in d:
-                if bool(d.get("requiresAha")):
-                    yes += 1
-                else:
-                    no += 1
-            else:
-                unknown += 1
-    except Exception:
-        pass
-
-    codes_ids = set()
     try:
-        for doc in db.collection("codes").stream():
-            codes_ids.add(doc.id)
+        yes = _count("decisions", "requiresAha", True)
+        no = _count("decisions", "requiresAha", False)
+        unknown = total_decisions - yes - no
     except Exception:
         pass
 
-    missing = sorted(codes_ids - decisions_ids)
+    missing_count, missing_sample = _missing_decisions()
 
     summary: Dict[str, Any] = {
         "counts": {
@@ -97,12 +129,18 @@ def main() -> int:
             "unknown": unknown,
         },
         "missing_decisions": {
-            "count": len(missing),
-            "sample": missing[:20],
+            "count": missing_count,
+            "sample": missing_sample,
         },
     }
 
-    print(json.dumps(summary, indent=2))
+    out = getattr(sys.stdout, "buffer", None)
+    if orjson is not None and out is not None:
+        sys.stdout.flush()
+        out.write(orjson.dumps(summary, option=orjson.OPT_INDENT_2) + b"\n")
+        out.flush()
+    else:
+        print(json.dumps(summary, indent=2))
     return 0
 
 
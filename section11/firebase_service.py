@@ -2,11 +2,13 @@
 
 from __future__ import annotations
 
+import functools
 import json
 import os
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Dict, Iterable
+from typing import Dict, Iterable, List, Tuple
 
 import importlib
 
@@ -47,12 +49,38 @@ def initialize_firestore_app() -> "firestore.Client":
     return firestore.client()
 
 
+# ``get_all`` lookups are chunked so a single request stays small
+_GET_ALL_CHUNK = 100
+
+
+def _get_documents(db: "firestore.Client", collection: str, codes: Iterable[str]) -> Dict[str, object]:
+    """Return existing snapshots of ``collection`` keyed by document id, in ``codes`` order."""
+    unique = list(dict.fromkeys(codes))
+    refs = [db.collection(collection).document(code) for code in unique]
+    found: Dict[str, object] = {}
+    if hasattr(db, "get_all"):
+        for start in range(0, len(refs), _GET_ALL_CHUNK):
+            for snap in db.get_all(refs[start:start + _GET_ALL_CHUNK]):
+                found[snap.id] = snap
+    elif refs:
+        # Clients without get_all: run the point reads concurrently instead
+        with ThreadPoolExecutor(max_workers=10) as pool:
+            found = dict(zip(unique, pool.map(lambda ref: ref.get(), refs)))
+    return {
+        code: found[code]
+        for code in unique
+        if code in found and getattr(found[code], "exists", False)
+    }
+
+
 def fetch_code_decisions(db: "firestore.Client", codes: Iterable[str]) -> Dict[str, Dict[str, object]]:
+    codes = list(codes)
+    snaps = _get_documents(db, "decisions", codes)
     decisions: Dict[str, Dict[str, object]] = {}
     for code in codes:
-        doc = db.collection("decisions").document(code).get()
-        if getattr(doc, "exists", False):
-            payload = dict(doc.to_dict() or {})
+        snap = snaps.get(code)
+        if snap is not None:
+            payload = dict(snap.to_dict() or {})
             payload.setdefault("status", "firestore")
             decisions[code] = payload
         else:
@@ -60,13 +88,25 @@ def fetch_code_decisions(db: "firestore.Client", codes: Iterable[str]) -> Dict[s
     return decisions
 
 
+def _decode_code_text(payload: Dict[str, object]) -> Dict[str, object]:
+    """Restore ``text`` for code docs stored zstd-compressed by ``process_codes``."""
+    blob = payload.pop("text_zst", None)
+    if blob is not None and str(payload.get("text_codec") or "").startswith("zstd"):
+        try:
+            zstd = importlib.import_module("zstandard")
+            payload["text"] = zstd.ZstdDecompressor().decompress(bytes(blob)).decode("utf-8")
+        except Exception as e:
+            code = payload.get("code_token") or "?"
+            print(f"[section11] WARNING: could not decode stored text for {code} ({e}); using empty text")
+            payload.setdefault("text", "")
+    return payload
+
+
 def fetch_code_metadata(db: "firestore.Client", codes: Iterable[str]) -> Dict[str, Dict[str, object]]:
-    metadata: Dict[str, Dict[str, object]] = {}
-    for code in codes:
-        doc = db.collection("codes").document(code).get()
-        if getattr(doc, "exists", False):
-            metadata[code] = dict(doc.to_dict() or {})
-    return metadata
+    return {
+        code: _decode_code_text(dict(snap.to_dict() or {}))
+        for code, snap in _get_documents(db, "codes", codes).items()
+    }
 
 
 def _bundle_payload(bundle: CategoryBundle) -> Dict[str, object]:
@@ -103,7 +143,9 @@ def write_run_to_firestore(run: Section11Run, upload_artifacts: bool = False) ->
         "pending_ahas": sum(1 for b in run.bundles if b.aha.status != CategoryStatus.required),
         "pending_plans": sum(1 for b in run.bundles if b.plan.status != CategoryStatus.required),
     }
-    run_ref.set(
+    # Every document of the run goes out in WriteBatch commits rather than one RPC each
+    writes: List[Tuple[object, Dict[str, object]]] = [(
+        run_ref,
         {
             "run_id": run.run_id,
             "source_file": str(run.source_file.name),
@@ -111,12 +153,12 @@ def write_run_to_firestore(run: Section11Run, upload_artifacts: bool = False) ->
             "created_at": datetime.now(timezone.utc).isoformat(),
             "metrics": metrics,
         },
-        merge=True,
-    )
+    )]
 
     codes_collection = run_ref.collection("codes")
     for code in run.parsed.codes:
-        codes_collection.document(code.code).set(
+        writes.append((
+            codes_collection.document(code.code),
             {
                 "code": code.code,
                 "title": code.title,
@@ -127,20 +169,20 @@ def write_run_to_firestore(run: Section11Run, upload_artifacts: bool = False) ->
                 "confidence": code.confidence,
                 "notes": code.notes,
             },
-            merge=True,
-        )
+        ))
 
     categories_collection = run_ref.collection("categories")
     for bundle in run.bundles:
-        categories_collection.document(bundle.category).set(_bundle_payload(bundle), merge=True)
+        writes.append((categories_collection.document(bundle.category), _bundle_payload(bundle)))
 
     overrides_collection = run_ref.collection("overrides")
     for override in run.diagnostics.overrides:
         key = f"{override['code']}->{override['category']}"
-        overrides_collection.document(key).set(override, merge=True)
+        writes.append((overrides_collection.document(key), override))
 
     artifacts_collection = run_ref.collection("artifacts")
-    artifacts_collection.document("section11").set(
+    writes.append((
+        artifacts_collection.document("section11"),
         {
             "markdown": str(run.artifacts.markdown_path),
             "docx": str(run.artifacts.docx_path),
@@ -148,8 +190,8 @@ def write_run_to_firestore(run: Section11Run, upload_artifacts: bool = False) ->
             "manifest": str(run.artifacts.manifest_path),
             "updated_at": datetime.now(timezone.utc).isoformat(),
         },
-        merge=True,
-    )
+    ))
+    _commit_merged(db, writes)
 
     if upload_artifacts:
         bucket = storage.bucket()
@@ -166,12 +208,34 @@ def write_run_to_firestore(run: Section11Run, upload_artifacts: bool = False) ->
             blob.upload_from_filename(str(path))
 
 
+# Firestore caps a WriteBatch at 500 writes
+_BATCH_LIMIT = 500
+
+
+def _commit_merged(db: "firestore.Client", writes: List[Tuple[object, Dict[str, object]]]) -> None:
+    """Apply ``ref.set(payload, merge=True)`` for each write, one commit per 500."""
+    for start in range(0, len(writes), _BATCH_LIMIT):
+        batch = db.batch()
+        for ref, payload in writes[start:start + _BATCH_LIMIT]:
+            batch.set(ref, payload, merge=True)
+        batch.commit()
+
+
 def _hash_file(path: Path) -> str:
+    stat = path.stat()
+    return _hash_file_cached(str(path), stat.st_mtime_ns, stat.st_size)
+
+
+@functools.lru_cache(maxsize=32)
+def _hash_file_cached(path_str: str, mtime_ns: int, size: int) -> str:
+    """SHA-256 of a file, memoized until its mtime or size changes."""
     import hashlib
 
-    hasher = hashlib.sha256()
-    with path.open("rb") as handle:
-        for chunk in iter(lambda: handle.read(8192), b""):
+    with open(path_str, "rb") as handle:
+        if hasattr(hashlib, "file_digest"):
+            return hashlib.file_digest(handle, "sha256").hexdigest()
+        hasher = hashlib.sha256()
+        for chunk in iter(lambda: handle.read(1 << 20), b""):
             hasher.update(chunk)
     return hasher.hexdigest()
 
@@ -190,8 +254,19 @@ def write_manifest(run: Section11Run) -> Path:
             for bundle in run.bundles
         },
     }
-    run.artifacts.manifest_path.write_text(json.dumps(manifest, indent=2), encoding="utf-8")
-    return run.artifacts.manifest_path
+    # json.dump streams the encoded chunks instead of building the whole document
+    # first; writing to a temp file and renaming keeps a failed dump from leaving
+    # a truncated manifest behind.
+    manifest_path = run.artifacts.manifest_path
+    tmp_path = manifest_path.with_name(manifest_path.name + ".tmp")
+    try:
+        with tmp_path.open("w", encoding="utf-8") as handle:
+            json.dump(manifest, handle, indent=2)
+        os.replace(tmp_path, manifest_path)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+    return manifest_path
 
 
 def build_diagnostics(run: Section11Run) -> RunDiagnostics:
@@ -0,0 +1,98 @@
+"""Shared fakes for tests that exercise Firestore writes and reads without a server."""
+
+from __future__ import annotations
+
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import pytest
+
+
+class FakeSnapshot:
+    def __init__(self, doc_id: str, data: Optional[Dict[str, Any]]):
+        self.id = doc_id
+        self.exists = data is not None
+        self._data = data
+
+    def to_dict(self) -> Optional[Dict[str, Any]]:
+        return dict(self._data) if self._data is not None else None
+
+
+class FakeDocRef:
+    def __init__(self, db: "FakeFirestore", collection: str, doc_id: str):
+        self.db = db
+        self.id = doc_id
+        self.path = f"{collection}/{doc_id}"
+
+    def get(self) -> FakeSnapshot:
+        return FakeSnapshot(self.id, self.db.docs.get(self.path))
+
+    def set(self, payload: Dict[str, Any], merge: bool = False) -> None:
+        assert merge is True
+        self.db.docs.setdefault(self.path, {}).update(payload)
+
+
+class FakeCollection:
+    def __init__(self, db: "FakeFirestore", name: str):
+        self.db = db
+        self.name = name
+
+    def document(self, doc_id: str) -> FakeDocRef:
+        return FakeDocRef(self.db, self.name, doc_id)
+
+
+class FakeBatch:
+    def __init__(self, db: "FakeFirestore"):
+        self.db = db
+        self.ops: List[Tuple[Any, Dict[str, Any]]] = []
+
+    def set(self, ref: Any, payload: Dict[str, Any], merge: bool = False) -> None:
+        assert merge is True
+        self.ops.append((ref, payload))
+
+    def commit(self) -> None:
+        if self.db.should_fail(self.ops):
+            raise RuntimeError("commit rejected")
+        paths = [getattr(ref, "path", ref) for ref, _ in self.ops]
+        for path, (_, payload) in zip(paths, self.ops):
+            self.db.docs.setdefault(path, {}).update(payload)
+        self.db.commits.append(paths)
+
+
+class FakeFirestore:
+    """In-memory stand-in for the parts of ``firestore.Client`` the scripts use.
+
+    ``commits`` lists the document paths of every committed batch and ``docs``
+    holds the merged payload per path. ``should_fail`` sees each batch's
+    ``(ref, payload)`` ops and rejects the commit when it returns true.
+    ``get_all`` exists only when ``supports_get_all`` is set, and returns the
+    snapshots in reverse order since Firestore does not promise any order.
+    """
+
+    def __init__(
+        self,
+        docs: Optional[Dict[str, Dict[str, Any]]] = None,
+        should_fail: Optional[Callable[[List[Tuple[Any, Dict[str, Any]]]], bool]] = None,
+        supports_get_all: bool = False,
+    ):
+        self.docs: Dict[str, Dict[str, Any]] = dict(docs or {})
+        self.commits: List[List[str]] = []
+        self.get_all_sizes: List[int] = []
+        self.should_fail = should_fail or (lambda ops: False)
+        if supports_get_all:
+            self.get_all = self._get_all
+
+    def batch(self) -> FakeBatch:
+        return FakeBatch(self)
+
+    def collection(self, name: str) -> FakeCollection:
+        return FakeCollection(self, name)
+
+    def _get_all(self, refs: Any) -> Any:
+        refs = list(refs)
+        self.get_all_sizes.append(len(refs))
+        return reversed([ref.get() for ref in refs])
+
+
+@pytest.fixture
+def fake_firestore() -> Callable[..., FakeFirestore]:
+    return FakeFirestore
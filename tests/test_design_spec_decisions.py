@@ -0,0 +1,25 @@
+from __future__ import annotations
+
+from scripts.process_design_spec import _write_decisions_batch
+
+
+def _items(n):
+    return {f"385-{i:04d}": {"requiresAha": bool(i % 2)} for i in range(n)}
+
+
+def test_decisions_commit_in_batches_of_500(fake_firestore):
+    db = fake_firestore()
+    _write_decisions_batch(db, _items(1203))
+    assert [len(c) for c in db.commits] == [500, 500, 203]
+    assert db.commits[0][0] == "decisions/385-0000"
+    assert db.commits[-1][-1] == "decisions/385-1202"
+
+
+def test_failed_decision_batch_is_logged_and_later_batches_commit(capsys, fake_firestore):
+    failures = iter([True])
+    db = fake_firestore(should_fail=lambda ops: next(failures, False))
+    _write_decisions_batch(db, _items(600))
+    assert [len(c) for c in db.commits] == [100]
+    out = capsys.readouterr().out
+    assert "decision write failed for 500 codes (385-0000..385-0499)" in out
+    assert "commit rejected" in out
@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+from docx import Document
+from docx.enum.text import WD_BREAK
+from docx.oxml import OxmlElement
+from docx.oxml.ns import qn
+
+
+def _add_hyperlink(paragraph, text: str) -> None:
+    link = OxmlElement("w:hyperlink")
+    link.set(qn("r:id"), "rId99")
+    run = OxmlElement("w:r")
+    t = OxmlElement("w:t")
+    t.text = text
+    run.append(t)
+    link.append(run)
+    paragraph._p.append(link)
+
+
+def _python_docx_text(path):
+    doc = Document(str(path))
+    paras = [(p.text or "").strip() for p in doc.paragraphs]
+    cells = []
+    for table in doc.tables:
+        for row in table.rows:
+            for cell in row.cells:
+                t = (cell.text or "").strip()
+                if t:
+                    cells.append(t)
+    return paras, cells
+
+
+def test_read_docx_xml_matches_python_docx(tmp_path):
+    from scripts.msf_ingest import _read_docx_xml
+
+    doc = Document()
+    doc.add_paragraph("01 35 26 GOVERNMENTAL SAFETY REQUIREMENTS")
+    p = doc.add_paragraph("Column A\tColumn B")
+    p.add_run().add_break()
+    p.add_run("second line")
+    p = doc.add_paragraph("Before page break")
+    p.add_run().add_break(WD_BREAK.PAGE)
+    p.add_run("after")
+    p = doc.add_paragraph("See ")
+    _add_hyperlink(p, "EM 385-1-1")
+    p.add_run(" for details.")
+    doc.add_paragraph("   padded   ")
+    table = doc.add_table(rows=2, cols=3)
+    table.cell(0, 0).text = "Hazard"
+    table.cell(0, 1).text = "Control"
+    table.cell(0, 2).text = "PPE"
+    table.cell(1, 0).text = "Fall"
+    table.cell(1, 1).merge(table.cell(1, 2)).text = "Guardrails"
+    path = tmp_path / "msf.docx"
+    doc.save(str(path))
+
+    paras, tables = _read_docx_xml(path)
+    expected_paras, expected_cells = _python_docx_text(path)
+
+    assert paras == expected_paras
+    assert "See EM 385-1-1 for details." in paras
+    assert "Column A\tColumn B\nsecond line" in paras
+    # python-docx repeats a merged cell once per grid column it spans
+    assert expected_cells.count("Guardrails") == 2
+    assert [t["text"] for t in tables] == list(dict.fromkeys(expected_cells))
+
+
+def test_read_docx_xml_returns_none_without_document_part(tmp_path):
+    import zipfile
+
+    from scripts.msf_ingest import _read_docx_xml
+
+    path = tmp_path / "empty.docx"
+    with zipfile.ZipFile(path, "w") as zf:
+        zf.writestr("[Content_Types].xml", "<Types/>")
+    assert _read_docx_xml(path) is None
+
+
+def test_detect_section_headers_matches_per_paragraph_regex():
+    from scripts.msf_ingest import _detect_section_header, _detect_section_headers
+
+    paras = [
+        "01 35 26 GOVERNMENTAL SAFETY REQUIREMENTS",
+        "",
+        "Intro text 01 35 26",
+        "31 23 00.00 20 - EXCAVATION AND FILL",
+        "02 41 00\tDEMOLITION",
+        "05 12 00",
+        "05 12 00 STRUCTURAL STEEL\nsecond line",
+        "1 2 3 not a header",
+    ]
+    expected = {i: h for i, h in ((i, _detect_section_header(p)) for i, p in enumerate(paras)) if h}
+    assert _detect_section_headers(paras) == expected
+    assert sorted(expected) == [0, 3, 4, 5]
+    assert expected[3]["section_code"] == "31 23 00.00"
+
+
+def test_detect_section_headers_tolerates_record_separator():
+    from scripts.msf_ingest import _detect_section_header, _detect_section_headers
+
+    paras = ["Notes\x1e31 23 00 EXCAVATION", "01 35 26 SAFETY\x1eCONT", "02 41 00 DEMOLITION"]
+    headers = _detect_section_headers(paras)
+    assert headers == {1: _detect_section_header(paras[1]), 2: _detect_section_header(paras[2])}
+    assert headers[2]["section_code"] == "02 41 00"
@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+import sys
+import types
+
+import scripts.process_codes as process_codes
+
+
+def _fake_utils():
+    calls = []
+
+    def query_collection_batch(col, queries, n_results):
+        calls.append(("vec", list(queries)))
+        return {"ids": [[f"v-{q}"] for q in queries], "metadatas": [[{"title": q}] for q in queries]}
+
+    def keyword_search_collection_batch(col, term_lists, max_results):
+        calls.append(("kw", [list(t) for t in term_lists]))
+        return {"ids": [["k"] for _ in term_lists], "metadatas": [[{"page_label": "p"}] for _ in term_lists]}
+
+    mod = types.ModuleType("utils")
+    mod.get_chroma_client = lambda d: None
+    mod.get_default_chroma_dir = lambda: "/unused"
+    mod.get_or_create_collection = lambda client, name: "COL"
+    mod.build_section_search_terms = lambda text: text.split()
+    mod.query_collection_batch = query_collection_batch
+    mod.keyword_search_collection_batch = keyword_search_collection_batch
+    return mod, calls
+
+
+def test_citations_survive_cache_eviction_within_one_call(monkeypatch):
+    mod, calls = _fake_utils()
+    monkeypatch.setitem(sys.modules, "utils", mod)
+    monkeypatch.setattr(process_codes, "_QUERY_CACHE", {})
+    monkeypatch.setattr(process_codes, "_QUERY_CACHE_MAX", 2)
+
+    texts = ["crane lift", "hot work", "crane lift", "fall protection"]
+    out = process_codes._rag_citations_batch(texts, "c")
+
+    assert [c[0]["section_path"] for c in out] == ["crane lift", "hot work", "crane lift", "fall protection"]
+    assert [c[1]["page_label"] for c in out] == ["p"] * 4
+    assert calls[0] == ("vec", ["crane lift", "hot work", "fall protection"])
+    assert len(process_codes._QUERY_CACHE) == 2
+
+
+def test_cached_queries_are_not_sent_again(monkeypatch):
+    mod, calls = _fake_utils()
+    monkeypatch.setitem(sys.modules, "utils", mod)
+    monkeypatch.setattr(process_codes, "_QUERY_CACHE", {})
+
+    process_codes._rag_citations_batch(["crane lift"], "c")
+    calls.clear()
+    out = process_codes._rag_citations_batch(["crane lift"], "c")
+    assert calls == []
+    assert out[0][0]["section_path"] == "crane lift"
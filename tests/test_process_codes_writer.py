@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+from scripts.process_codes import BufferedFirestoreWriter
+
+
+def _fails_on_flag(ops):
+    return any(payload.get("fail") for _, payload in ops)
+
+
+def test_writer_commits_every_max_ops_in_order(fake_firestore):
+    db = fake_firestore()
+    with BufferedFirestoreWriter(db, max_ops=2) as writer:
+        for i in range(5):
+            writer.upsert("codes", str(i), {"i": i})
+    assert db.commits == [["codes/0", "codes/1"], ["codes/2", "codes/3"], ["codes/4"]]
+    assert writer.failed_writes == 0
+
+
+def test_writer_flushes_on_payload_bytes(fake_firestore):
+    db = fake_firestore()
+    with BufferedFirestoreWriter(db, max_ops=100, max_bytes=64) as writer:
+        writer.upsert("codes", "a", {"text": "x" * 40})
+        writer.upsert("codes", "b", {"text": "y" * 40})
+        writer.upsert("codes", "c", {})
+    assert db.commits == [["codes/a"], ["codes/b", "codes/c"]]
+
+
+def test_failed_commit_is_counted_and_later_batches_still_commit(capsys, fake_firestore):
+    db = fake_firestore(should_fail=_fails_on_flag)
+    with BufferedFirestoreWriter(db, max_ops=2) as writer:
+        writer.upsert("codes", "a", {})
+        writer.upsert("codes", "b", {"fail": True})
+        writer.upsert("codes", "c", {})
+    assert writer.failed_writes == 2
+    assert db.commits == [["codes/c"]]
+    assert "2 writes lost" in capsys.readouterr().out
+
+
+def test_upsert_all_keeps_a_group_in_one_batch(fake_firestore):
+    db = fake_firestore()
+    with BufferedFirestoreWriter(db, max_ops=4) as writer:
+        for token in ("a", "b"):
+            writer.upsert_all([
+                ("codes", token, {"text_hash": token}),
+                ("codes", token, {"text": token}),
+                ("decisions", token, {"requiresAha": True}),
+            ])
+    assert db.commits == [
+        ["codes/a", "codes/a", "decisions/a"],
+        ["codes/b", "codes/b", "decisions/b"],
+    ]
+
+
+def test_failed_oversized_text_write_leaves_text_hash_unset(monkeypatch, fake_firestore):
+    from pathlib import Path
+
+    import scripts.process_codes as process_codes
+
+    monkeypatch.setattr(process_codes, "_MAX_DOC_BYTES", 10)
+    monkeypatch.setattr(BufferedFirestoreWriter, "set_now", lambda self, collection, doc_id, payload: False)
+    db = fake_firestore()
+    decision = {"requiresAha": True, "confidence": 0.9}
+    with BufferedFirestoreWriter(db) as writer:
+        process_codes._write_code(writer, "ts", Path("a.txt"), "385-1.1", "Title", "abc123", "x" * 100, "EM385", decision)
+    assert db.commits == [["codes/385-1.1", "decisions/385-1.1"]]
+    assert "text_hash" not in db.docs["codes/385-1.1"]
+    assert db.docs["decisions/385-1.1"] == decision
@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from section11.firebase_service import _commit_merged, fetch_code_decisions, fetch_code_metadata, write_manifest
+
+
+def test_commit_merged_splits_at_500_writes(fake_firestore):
+    db = fake_firestore()
+    _commit_merged(db, [(f"runs/r/codes/{i}", {"i": i}) for i in range(1001)])
+    assert [len(c) for c in db.commits] == [500, 500, 1]
+    assert db.commits[0][0] == "runs/r/codes/0"
+    assert db.commits[-1] == ["runs/r/codes/1000"]
+
+
+def test_commit_merged_without_writes_commits_nothing(fake_firestore):
+    db = fake_firestore()
+    _commit_merged(db, [])
+    assert db.commits == []
+
+
+_DOCS = {
+    "decisions/A": {"requiresAha": True},
+    "decisions/C": {"requiresAha": False, "status": "manual"},
+    "codes/A": {"title": "Cranes", "text": "plain"},
+}
+
+
+def test_fetch_code_decisions_uses_get_all_and_keeps_input_order(fake_firestore):
+    db = fake_firestore(_DOCS, supports_get_all=True)
+    out = fetch_code_decisions(db, iter(["C", "B", "A", "C"]))
+    assert list(out) == ["C", "B", "A"]
+    assert out["A"] == {"requiresAha": True, "status": "firestore"}
+    assert out["B"] == {"status": "unknown"}
+    assert out["C"]["status"] == "manual"
+    assert db.get_all_sizes == [3]
+
+
+def test_fetch_code_decisions_chunks_get_all_by_100(fake_firestore):
+    db = fake_firestore(supports_get_all=True)
+    out = fetch_code_decisions(db, [f"X{i}" for i in range(250)])
+    assert len(out) == 250
+    assert db.get_all_sizes == [100, 100, 50]
+
+
+def test_fetch_code_metadata_falls_back_to_point_reads(fake_firestore):
+    out = fetch_code_metadata(fake_firestore(_DOCS), ["B", "A"])
+    assert out == {"A": {"title": "Cranes", "text": "plain"}}
+    assert fetch_code_metadata(fake_firestore(_DOCS), []) == {}
+
+
+def _manifest_run(tmp_path, source_name):
+    artifacts = SimpleNamespace(
+        base_dir=tmp_path,
+        markdown_path=tmp_path / "section11.md",
+        docx_path=tmp_path / "section11.docx",
+        json_report_path=tmp_path / "section11.json",
+        manifest_path=tmp_path / "manifest.json",
+    )
+    return SimpleNamespace(run_id="run-1", source_file=SimpleNamespace(name=source_name), artifacts=artifacts, bundles=[])
+
+
+def test_write_manifest_writes_complete_json(tmp_path):
+    path = write_manifest(_manifest_run(tmp_path, "spec.pdf"))
+    assert json.loads(path.read_text(encoding="utf-8"))["source_file"] == "spec.pdf"
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["manifest.json"]
+
+
+def test_write_manifest_leaves_no_partial_file_on_failure(tmp_path):
+    with pytest.raises(TypeError):
+        write_manifest(_manifest_run(tmp_path, object()))
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+import pytest
+
+
+class FakeCollection:
+    def __init__(self, docs, metas=None):
+        self.docs = docs
+        self.metas = metas or [{"i": i} for i in range(len(docs))]
+        self.ids = [f"id{i}" for i in range(len(docs))]
+        self.query_calls = []
+        self.get_calls = []
+
+    def count(self):
+        return len(self.docs)
+
+    def get(self, include=None, limit=None, offset=0):
+        self.get_calls.append((limit, offset))
+        end = offset + limit
+        return {"documents": self.docs[offset:end], "metadatas": self.metas[offset:end], "ids": self.ids[offset:end]}
+
+    def query(self, query_texts, n_results, where, include):
+        self.query_calls.append({"query_texts": query_texts, "n_results": n_results, "where": where})
+        return {"ids": [[f"hit-{q}"] for q in query_texts]}
+
+
+@pytest.fixture
+def utils():
+    import utils
+
+    return utils
+
+
+def test_query_collection_batch_sends_one_query(monkeypatch, utils):
+    monkeypatch.setattr(utils, "get_namespace", lambda: None)
+    col = FakeCollection(["a"])
+    res = utils.query_collection_batch(col, ["crane", "excavation"], n_results=3, where={"src": "em385"})
+    assert col.query_calls == [{"query_texts": ["crane", "excavation"], "n_results": 3, "where": {"src": "em385"}}]
+    assert res["ids"] == [["hit-crane"], ["hit-excavation"]]
+    assert utils.query_collection(col, "crane")["ids"] == [["hit-crane"]]
+
+
+def test_query_collection_batch_applies_namespace_filter(monkeypatch, utils):
+    monkeypatch.setattr(utils, "get_namespace", lambda: "projB")
+    col = FakeCollection(["a"], metas=[{"namespace": "projB"}])
+    utils.query_collection_batch(col, ["crane"], where={"src": "em385"})
+    assert col.query_calls[0]["where"] == {"src": "em385", "namespace": "projB"}
+
+
+def test_keyword_search_batch_matches_single_searches(monkeypatch, utils):
+    monkeypatch.setattr(utils, "get_namespace", lambda: None)
+    docs = ["Crane lift plan", "Excavation shoring", "crane inspection", "Hot work permit", "EXCAVATION trench"]
+    queries = [["crane"], ["excavation", "hot work"], [], ["missing"]]
+    col = FakeCollection(docs)
+    batch = utils.keyword_search_collection_batch(col, queries, max_results=2, batch_size=2)
+    for q, subs in enumerate(queries):
+        single = utils.keyword_search_collection(FakeCollection(docs), subs, max_results=2, batch_size=2)
+        assert batch["ids"][q] == single["ids"][0]
+        assert batch["documents"][q] == single["documents"][0]
+        assert batch["metadatas"][q] == single["metadatas"][0]
+    assert batch["ids"] == [["id0", "id2"], ["id1", "id3"], [], []]
+
+
+def test_keyword_search_batch_stops_scanning_once_queries_are_full(monkeypatch, utils):
+    monkeypatch.setattr(utils, "get_namespace", lambda: None)
+    col = FakeCollection(["crane"] * 10)
+    res = utils.keyword_search_collection_batch(col, [["crane"]], max_results=2, batch_size=2)
+    assert res["ids"] == [["id0", "id1"]]
+    assert col.get_calls == [(2, 0)]
+
+
+def test_keyword_search_batch_restricts_to_namespace(monkeypatch, utils):
+    monkeypatch.setattr(utils, "get_namespace", lambda: "projB")
+    metas = [{"namespace": "projB"}, {"namespace": "other"}, {"namespace": "projB"}]
+    col = FakeCollection(["crane a", "crane b", "crane c"], metas=metas)
+    res = utils.keyword_search_collection_batch(col, [["crane"]], max_results=5)
+    assert res["ids"] == [["id0", "id2"]]
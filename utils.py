@@ -594,6 +594,26 @@ def query_collection(
     Returns:
         Query results containing documents, metadatas, distances, and ids
     """
+    return query_collection_batch(collection, [query_text], n_results=n_results, where=where)
+
+
+def query_collection_batch(
+    collection: chromadb.Collection,
+    query_texts: List[str],
+    n_results: int = 5,
+    where: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """Query a ChromaDB collection with several texts in a single call.
+
+    Args:
+        collection: ChromaDB collection
+        query_texts: Texts to search for
+        n_results: Number of results to return per query
+        where: Optional filter to apply to every query
+
+    Returns:
+        Query results with one inner list per query text, in input order
+    """
     # Merge namespace filter if configured
     ns = get_namespace()
     final_where: Optional[Dict[str, Any]] = None
@@ -616,7 +636,7 @@ def query_collection(
 
     # Query the collection with optional namespace filter
     return collection.query(
-        query_texts=[query_text],
+        query_texts=list(query_texts),
         n_results=n_results,
         where=final_where,
         include=["documents", "metadatas", "distances"]
@@ -672,11 +692,32 @@ def keyword_search_collection(
     Returns:
         A dict similar to collection.query output shape with keys: documents, metadatas, ids.
     """
-    normalized = [s.lower() for s in substrings if s]
+    return keyword_search_collection_batch(collection, [substrings], max_results=max_results, batch_size=batch_size)
+
+
+def keyword_search_collection_batch(
+    collection: chromadb.Collection,
+    substrings_per_query: List[List[str]],
+    max_results: int = 5,
+    batch_size: int = 500,
+) -> Dict[str, Any]:
+    """Run several substring searches over a collection in one scan.
+
+    Args:
+        collection: The ChromaDB collection to search.
+        substrings_per_query: One list of case-insensitive substrings per query.
+        max_results: Maximum number of matches to return per query.
+        batch_size: Number of items to scan per batch.
+
+    Returns:
+        A dict shaped like collection.query output, with one inner list per query.
+    """
+    normalized = [[s.lower() for s in subs if s] for subs in substrings_per_query]
     total = collection.count()
-    results_docs: List[str] = []
-    results_metas: List[Dict[str, Any]] = []
-    results_ids: List[str] = []
+    results_docs: List[List[str]] = [[] for _ in normalized]
+    results_metas: List[List[Dict[str, Any]]] = [[] for _ in normalized]
+    results_ids: List[List[str]] = [[] for _ in normalized]
+    open_queries = [q for q, subs in enumerate(normalized) if subs]
 
     offset = 0
     ns = get_namespace()
@@ -691,7 +732,7 @@ def keyword_search_collection(
             has_ns = False
         if has_ns:
             print(f"[keyword_scan] Restricting scan to namespace='{ns}'")
-    while offset < total and len(results_docs) < max_results:
+    while offset < total and open_queries:
         res = collection.get(include=["documents", "metadatas"], limit=min(batch_size, total - offset), offset=offset)
         docs = res.get("documents", [])
         metas = res.get("metadatas", [])
@@ -700,18 +741,23 @@ def keyword_search_collection(
             if ns and has_ns and (meta or {}).get("namespace") != ns:
                 continue
             text = (doc or "").lower()
-            if any(sub in text for sub in normalized):
-                results_docs.append(doc)
-                results_metas.append(meta)
-                results_ids.append(id_)
-                if len(results_docs) >= max_results:
+            filled = False
+            for q in open_queries:
+                if any(sub in text for sub in normalized[q]):
+                    results_docs[q].append(doc)
+                    results_metas[q].append(meta)
+                    results_ids[q].append(id_)
+                    filled = filled or len(results_docs[q]) >= max_results
+            if filled:
+                open_queries = [q for q in open_queries if len(results_docs[q]) < max_results]
+                if not open_queries:
                     break
         offset += batch_size
 
     return {
-        "documents": [results_docs],
-        "metadatas": [results_metas],
-        "ids": [results_ids],
+        "documents": results_docs,
+        "metadatas": results_metas,
+        "ids": results_ids,
     }
 
 